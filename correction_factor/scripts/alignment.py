@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+
+# Copyright 2025 Universidad Politécnica de Madrid
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer in the
+#      documentation and/or other materials provided with the distribution.
+#
+#    * Neither the name of the Universidad Politécnica de Madrid nor the names of its
+#      contributors may be used to endorse or promote products derived from
+#      this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+""" Alignment of time series sampled at different rates. """
+
+__authors__ = 'Carmen De Rojas Pita-Romero'
+__copyright__ = 'Copyright (c) 2025 Universidad Politécnica de Madrid'
+__license__ = 'BSD-3-Clause'
+
+import numpy as np
+from resampling import aggregate_bins
+
+
+def align_to_windows(source_time: np.ndarray, source_value: np.ndarray, window_time: np.ndarray,
+                     how: str = 'mean', keep_empty: bool = False) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Aggregate a source signal in the windows defined by the times of another signal.
+
+    The window k goes from window_time[k] (included) to window_time[k + 1] (excluded).
+
+    :param source_time: Times of the signal to aggregate, in any order
+    :param source_value: Values of the signal to aggregate
+    :param window_time: Times that define the windows, sorted in ascending order
+    :param how: 'mean', 'median', 'last', 'min', 'max' or 'count'
+    :param keep_empty: If False, the windows without samples are left out
+    :return: (start time of each window, aggregated value)
+    :raises ValueError: If the window times are not sorted
+    """
+    source_time = np.asarray(source_time)
+    source_value = np.asarray(source_value, dtype=np.float64)
+    window_time = np.asarray(window_time)
+    if np.any(window_time[1:] < window_time[:-1]):
+        raise ValueError("The times that define the windows must be sorted")
+    n_windows = max(len(window_time) - 1, 0)
+
+    windows = np.searchsorted(window_time, source_time, side='right') - 1
+    inside = (windows >= 0) & (windows < n_windows)
+    values = aggregate_bins(windows[inside], source_value[inside], n_windows, how)
+    starts = window_time[:n_windows]
+    if keep_empty:
+        return starts, values
+
+    counts = np.bincount(windows[inside], minlength=n_windows)
+    return starts[counts > 0], values[counts > 0]
+
+
+def hold(source_time: np.ndarray, source_value: np.ndarray, base_time: np.ndarray) -> np.ndarray:
+    """
+    Zero-order hold of a source signal at the base times. Base times before the first source
+    sample get the first source value.
+
+    :param source_time: Times of the signal to hold, sorted here if needed
+    :param source_value: Values of the signal to hold
+    :param base_time: Times where the signal is evaluated
+    :return: Last source value at or before each base time
+    """
+    source_time = np.asarray(source_time)
+    source_value = np.asarray(source_value, dtype=np.float64)
+    if np.any(source_time[1:] < source_time[:-1]):
+        order = np.argsort(source_time, kind='stable')
+        source_time, source_value = source_time[order], source_value[order]
+    indices = np.searchsorted(source_time, base_time, side='right') - 1
+    return source_value[np.clip(indices, 0, None)]
+
+
+def sample_period(time: np.ndarray) -> float:
+    """
+    Median time between consecutive distinct samples of a signal.
+
+    :param time: Times of the signal, in any order
+    :return: Sample period, 0 if the signal has less than two distinct times
+    """
+    time = np.asarray(time, dtype=np.float64)
+    steps = np.diff(np.unique(time[np.isfinite(time)]))
+    return float(np.median(steps)) if len(steps) else 0.0
+
+
+def match_nearest(time1: np.ndarray, time2: np.ndarray,
+                  tolerance: float = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Match each sample of a first signal with the sample of a second signal nearest in time,
+    if it is within the tolerance. The times do not need to be sorted.
+
+    When several samples of the second signal share the nearest time, the k-th sample of
+    the first signal matched to that time takes the k-th of them, so two signals with the
+    same times are matched one to one, in order. Samples left without a pair are not matched.
+
+    :param time1: Times of the first signal
+    :param time2: Times of the second signal
+    :param tolerance: Maximum time difference between matched samples. If None, half the
+        sample period of the second signal, so each sample is only matched inside its period
+    :return: (indices in the first signal, indices in the second signal) of the matched
+        samples, in the order of the first signal
+    """
+    time1 = np.asarray(time1, dtype=np.float64)
+    time2 = np.asarray(time2, dtype=np.float64)
+    if len(time1) == 0 or len(time2) == 0:
+        empty = np.empty(0, dtype=np.intp)
+        return empty, empty.copy()
+    if tolerance is None:
+        tolerance = sample_period(time2) / 2
+
+    order2 = np.argsort(time2, kind='stable')
+    sorted2 = time2[order2]
+    right = np.clip(np.searchsorted(sorted2, time1), 1, len(sorted2) - 1)
+    left = right - 1
+    if len(sorted2) == 1:
+        right = left = np.zeros(len(time1), dtype=np.intp)
+    nearest = np.where(np.abs(sorted2[left] - time1) <= np.abs(sorted2[right] - time1), left, right)
+    within = np.abs(sorted2[nearest] - time1) <= tolerance
+    index1 = np.flatnonzero(within)
+    nearest = nearest[index1]
+
+    # Rank of each sample among the samples of the first signal matched to the same time
+    run_start = np.searchsorted(sorted2, sorted2[nearest], side='left')
+    run_length = np.searchsorted(sorted2, sorted2[nearest], side='right') - run_start
+    by_run = np.argsort(run_start, kind='stable')
+    run_starts_sorted = run_start[by_run]
+    first_of_run = np.searchsorted(run_starts_sorted, run_starts_sorted, side='left')
+    rank = np.empty_like(run_start)
+    rank[by_run] = np.arange(len(by_run)) - first_of_run
+
+    paired = rank < run_length
+    return index1[paired], order2[run_start[paired] + rank[paired]]
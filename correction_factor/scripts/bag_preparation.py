@@ -40,41 +40,132 @@ import csv_utils as csvr
 import compute_results as cr
 import yaml
 import os
+from concurrent.futures import ProcessPoolExecutor
 
 
 # from bag_reader import read_rosbag, deserialize_msgs
-from bag_reader import LogData
+from bag_reader import LogSeries
+from series_cache import SeriesCache
 import argparse
 
+# Topics used by the preprocessing, the rest of the rosbag is never read
+PREPROCESSING_TOPICS = [
+    "actuator_command/thrust",
+    "sensor_measurements/imu",
+    "sensor_measurements/battery",
+    "debug/rc/command",
+    "platform/info",
+    "self_localization/pose",
+]
+
+
+def find_rosbags(log_file: str) -> list[Path]:
+    """
+    Get the rosbags in a path
+
+    :param log_file: Rosbag folder, or folder with several rosbag folders
+    :return: List of rosbag folders
+    """
+    path = Path(log_file)
+    if path.is_file():
+        raise NotADirectoryError(f"{log_file} is not a directory")
+    if not path.is_dir():
+        raise FileNotFoundError(f"{log_file} does not exist")
+
+    for child in path.iterdir():
+        if child.is_file() and child.suffix == ".db3":
+            return [path]
+    return sorted(child for child in path.iterdir() if child.is_dir())
+
+
+def read_flight(log: Path, cache: SeriesCache = None, flying_only: bool = False) -> LogSeries:
+    """Read the time series used by the preprocessing from one rosbag"""
+    return LogSeries.from_rosbag(log, PREPROCESSING_TOPICS, cache, flying_only)
+
+
+def read_rosbags(log_file: str, merge: bool = False, max_workers: int = None,
+                 cache: SeriesCache = None, flying_only: bool = False) -> list[LogSeries] | LogSeries:
+    """
+    Read every rosbag in a path, in parallel when there are several of them
+
+    :param log_file: Rosbag folder, or folder with several rosbag folders
+    :param merge: If True, merge all the rosbags into one dataset ordered by time
+    :param max_workers: Number of processes. If None, the number of CPUs.
+    :param cache: Cache of the series already read
+    :param flying_only: If True, do not read the data before taking off and after landing
+    :return: List with the data of each rosbag, or the merged data
+    """
+    logs = find_rosbags(log_file)
+    if len(logs) <= 1:
+        flights = [read_flight(log, cache, flying_only) for log in logs]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            flights = list(executor.map(read_flight, logs, [cache] * len(logs),
+                                        [flying_only] * len(logs)))
+
+    if merge:
+        return LogSeries.merge(flights)
+    return flights
+
 
 class ProcessRosbag:
-    def __init__(self, log_file: str):
+    def __init__(self, log_file: str | LogSeries, max_workers: int = None,
+                 cache: SeriesCache = None, flying_only: bool = False, merge: bool = None):
+        """
+        :param log_file: Rosbag path or data already read. To process each rosbag of a path
+        with several of them, use from_flights.
+        :param max_workers: Number of processes to read the rosbags
+        :param cache: Cache of the series already read
+        :param flying_only: If True, do not read the data before taking off and after landing
+        :param merge: What to do with a path with several rosbags. If True, they are merged
+        into one dataset, so the preprocessing goes from the first take off to the last landing
+        and the time on the ground between flights is resampled too. If None, they are merged
+        with a warning. If False, a ValueError is raised.
+        """
         self.compute_results = cr.ResultsComputer()
         self.csv_results = csvr.CSVResults()
-        if Path(log_file).is_dir():
-            log_files = list(Path(log_file).iterdir())
-            for child in Path(log_file).iterdir():
-                if child.is_file() and child.suffix == ".db3":
-                    log_files = [Path(log_file)]
-                    break
-        elif Path(log_file).is_file():
-            print('else')
-            raise NotADirectoryError(f"{log_file} is not a directory")
+        if isinstance(log_file, LogSeries):
+            self.data = log_file
+            return
+        flights = read_rosbags(log_file, max_workers=max_workers, cache=cache,
+                               flying_only=flying_only)
+        if len(flights) == 1:
+            self.data = flights[0]
+            return
+        if merge is False:
+            raise ValueError(f"{log_file} holds {len(flights)} rosbags, use ProcessRosbag.from_flights "
+                             "to process each flight or merge=True to merge them")
+        if merge is None:
+            print(f"WARNING: {log_file} holds {len(flights)} rosbags, they are merged into one dataset. "
+                  "Use ProcessRosbag.from_flights to process each flight")
+        self.data = LogSeries.merge(flights)
+
+    @classmethod
+    def from_flights(cls, log_file: str, max_workers: int = None, cache: SeriesCache = None,
+                     flying_only: bool = False) -> list['ProcessRosbag']:
+        """
+        Read every rosbag in a path in parallel, keeping one processor per flight
 
-        for log in log_files:
-            self.data = LogData.from_rosbag(log)
+        :param log_file: Rosbag folder, or folder with several rosbag folders
+        :param max_workers: Number of processes to read the rosbags
+        :param cache: Cache of the series already read
+        :param flying_only: If True, do not read the data before taking off and after landing
+        :return: List of processors, one per rosbag
+        """
+        return [cls(flight) for flight in read_rosbags(log_file, max_workers=max_workers,
+                                                       cache=cache, flying_only=flying_only)]
 
-    def run_preprocesing(self, mass):
+    def run_preprocesing(self, mass, freq_hz: float = 1.0):
 
         # Get the data from the log
-        imu = self.compute_results.get_data(self.data.imu)
-        thrust = self.compute_results.get_data(self.data.thrust)
-        battery = self.compute_results.get_data(self.data.battery)
-        status_info = self.compute_results.get_data(self.data.platform_info)
-        throttle = self.compute_results.get_data(self.data.rc_command)
-        position = self.compute_results.get_data(self.data.position)
-
-        # Synchronize the data to the same time limits and fz: 1 Hz
+        imu = self.data.imu
+        thrust = self.data.thrust
+        battery = self.data.battery
+        status_info = self.data.platform_info
+        throttle = self.data.rc_command
+        position = self.data.position
+
+        # Synchronize the data to the same time limits and sample frequency (default: 1 Hz)
         status_info_time = self.compute_results.interval_flying(status_info)
         position_time = self.compute_results.adjust_time_limits(status_info_time, position)
         throttle_commanded_time = self.compute_results.adjust_time_limits(
@@ -82,11 +173,10 @@ class ProcessRosbag:
         imu_time = self.compute_results.adjust_time_limits(status_info_time, imu)
         battery_time = self.compute_results.adjust_time_limits(status_info_time, battery)
         thrust_commanded_time = self.compute_results.adjust_time_limits(status_info_time, thrust)
-        self.position_sampled = self.compute_results.fz_sample(position_time, 1.0)
-        self.imu_sampled = self.compute_results.fz_sample(imu_time, 1.0)
-        self.thrust_commanded = self.compute_results.fz_sample(thrust_commanded_time, 1.0)
-        self.battery_sampled = self.compute_results.fz_sample(battery_time, 1.0)
-        self.throttle_commanded = self.compute_results.fz_sample(throttle_commanded_time, 1.0)
+        (self.position_sampled, self.imu_sampled, self.thrust_commanded, self.battery_sampled,
+         self.throttle_commanded) = self.compute_results.fz_sample_all(
+            [position_time, imu_time, thrust_commanded_time, battery_time,
+             throttle_commanded_time], freq_hz)
 
         # Compute thrust measured and correction factor. CHANGE DRONE'S MASS
         # thrust_measured = compute_results.run_param_reference(imu_sampled, 0.96)
@@ -94,10 +184,13 @@ class ProcessRosbag:
         self.thrust_measured = self.compute_results.run_thrust_reference(
             self.imu_sampled, self.mass)
 
-    def save_results(self, filename: str, folder_name: str):
+    def save_results(self, filename: str, folder_name: str, csv_results: csvr.CSVResults = None):
         """
         Save the results to csv files
+
+        :param csv_results: Writer with the storage options. If None, the default CSV writer.
         """
+        csv_results = csv_results or self.csv_results
 
         time, thrust_commanded = zip(*self.thrust_commanded)
         time, thrust_measured = zip(*self.thrust_measured)
@@ -106,7 +199,7 @@ class ProcessRosbag:
         time, a_z = zip(*self.imu_sampled)
         time, position = zip(*self.position_sampled)
         m = [self.mass] * len(battery)
-        self.csv_results.save_data([thrust_commanded, thrust_measured, battery, a_z, m, throttle, position, time], [
+        csv_results.save_data([thrust_commanded, thrust_measured, battery, a_z, m, throttle, position, time], [
             'Thrust sended (N)', 'Thrust measured (N)', 'Voltage (V)', 'Acc (m/s²)', 'm (Kg)', 'Throttle (%)', 'Position_z (m)', 'Time (s)'], f"{filename}.csv", f"data/{folder_name}/")
 
     def run_file_computing(self):
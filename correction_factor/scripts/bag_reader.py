@@ -28,35 +28,355 @@
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
 # POSSIBILITY OF SUCH DAMAGE.
 
-from typing import Any
+from typing import Any, Callable, Iterable, Iterator
+from array import array
+import struct
+import numpy as np
 from rclpy.serialization import deserialize_message
-from rosbag2_py import SequentialReader, StorageOptions, ConverterOptions
+from rosbag2_py import SequentialReader, StorageOptions, ConverterOptions, StorageFilter
 from tf2_msgs.msg import TFMessage
 from tf2_ros.buffer import Buffer
 from as2_msgs.msg import Thrust, PlatformInfo, UInt16MultiArrayStamped
 from sensor_msgs.msg import Imu, BatteryState
 from geometry_msgs.msg import Vector3Stamped, PoseStamped
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, fields
 from pathlib import Path
+import os
+from time_series import TimeSeries
+from series_cache import SeriesCache
+from compute_results import FLYING_STATUS
 
+# Topics read by LogData: topic name suffix -> (LogData attribute, message type)
+LOG_TOPICS = {
+    "actuator_command/thrust": ("thrust", Thrust),
+    "sensor_measurements/imu": ("imu", Imu),
+    "sensor_measurements/battery": ("battery", BatteryState),
+    "debug/controller_reference": ("controller_reference", Vector3Stamped),
+    "debug/controller_state": ("controller_state", Vector3Stamped),
+    "debug/rc/command": ("rc_command", UInt16MultiArrayStamped),
+    "platform/info": ("platform_info", PlatformInfo),
+    "self_localization/pose": ("position", PoseStamped),
+}
 
-def read_rosbag(filename: str) -> dict[str, list[Any]]:
-    """Read a rosbag"""
+
+def open_rosbag(filename: str) -> SequentialReader:
+    """Open a rosbag for sequential reading"""
     bag_reader = SequentialReader()
     storage_options = StorageOptions(uri=filename, storage_id="sqlite3")
     converter_options = ConverterOptions(
         input_serialization_format="", output_serialization_format="")
     bag_reader.open(storage_options, converter_options)
+    return bag_reader
+
+
+def match_topics(bag_reader: SequentialReader, topics: Iterable[str]) -> list[str]:
+    """
+    Get the names of the topics in the rosbag that contain any of the given topic names
+
+    :param bag_reader: Opened rosbag reader
+    :param topics: Topic names or suffixes, e.g. "sensor_measurements/imu"
+    :return: Full topic names found in the rosbag
+    """
+    topics = list(topics)
+    return [metadata.name for metadata in bag_reader.get_all_topics_and_types()
+            if any(topic in metadata.name for topic in topics)]
+
+
+def stream_rosbag(filename: str, topics: Iterable[str] = None) -> Iterator[tuple[str, bytes, int]]:
+    """
+    Stream the serialized messages of a rosbag one by one.
+
+    The topic filter is applied by the storage, so messages from other topics are never
+    loaded into memory.
+
+    :param filename: Rosbag path
+    :param topics: Topic names or suffixes to read. If None, all topics are read.
+    :return: Generator of (topic, serialized message, timestamp in ns)
+    """
+    bag_reader = open_rosbag(filename)
+    if topics is not None:
+        topic_names = match_topics(bag_reader, topics)
+        if not topic_names:
+            # An empty storage filter would read every topic
+            return
+        bag_reader.set_filter(StorageFilter(topics=topic_names))
 
-    topics_dict = {}
     while bag_reader.has_next():
-        topic, msg, _ = bag_reader.read_next()
+        yield bag_reader.read_next()
+
+
+def read_rosbag(filename: str, topics: Iterable[str] = None) -> dict[str, list[Any]]:
+    """Read a rosbag"""
+    topics_dict = {}
+    for topic, msg, _ in stream_rosbag(filename, topics):
         if topic not in topics_dict:
             topics_dict[topic] = []
         topics_dict[topic].append(msg)
     return topics_dict
 
 
+def stamp_to_ns(stamp) -> int:
+    """Convert a builtin_interfaces/Time to nanoseconds"""
+    return stamp.sec * 1_000_000_000 + stamp.nanosec
+
+
+@dataclass(frozen=True)
+class SeriesTopic:
+    """Single field of a topic extracted as a time series"""
+    attribute: str
+    msg_type: Any
+    # Get (stamp in ns, value) from a deserialized message
+    getter: Callable[[Any], tuple[int, float]]
+
+
+# Topics read by LogSeries: topic name suffix -> extracted field
+SERIES_TOPICS = {
+    "actuator_command/thrust": SeriesTopic(
+        "thrust", Thrust, lambda msg: (stamp_to_ns(msg.header.stamp), msg.thrust)),
+    "sensor_measurements/imu": SeriesTopic(
+        "imu", Imu, lambda msg: (stamp_to_ns(msg.header.stamp), msg.linear_acceleration.z)),
+    "sensor_measurements/battery": SeriesTopic(
+        "battery", BatteryState, lambda msg: (stamp_to_ns(msg.header.stamp), msg.voltage)),
+    "debug/rc/command": SeriesTopic(
+        "rc_command", UInt16MultiArrayStamped, lambda msg: (stamp_to_ns(msg.stamp), msg.data[2])),
+    "platform/info": SeriesTopic(
+        "platform_info", PlatformInfo, lambda msg: (stamp_to_ns(msg.header.stamp), msg.status.state)),
+    "self_localization/pose": SeriesTopic(
+        "position", PoseStamped, lambda msg: (stamp_to_ns(msg.header.stamp), msg.pose.position.z)),
+}
+
+
+# Topics with the platform status
+STATUS_TOPICS = ["platform/info"]
+
+
+@dataclass(frozen=True)
+class CdrField:
+    """
+    Location of a field in a CDR serialized message that starts with a std_msgs/Header
+
+    :param alignment: Alignment of the first member after the header
+    :param offset: Offset of the field from that member
+    :param fmt: struct format of the field
+    """
+    alignment: int
+    offset: int
+    fmt: str
+
+
+# Message type -> field decoded without deserializing the message. Other types fall back
+# to deserialize_message and the getter of their SeriesTopic.
+CDR_FIELDS = {
+    # orientation, orientation_covariance, angular_velocity, angular_velocity_covariance,
+    # linear_acceleration.x, linear_acceleration.y -> linear_acceleration.z
+    "sensor_msgs/msg/Imu": CdrField(8, 216, "d"),
+    "sensor_msgs/msg/BatteryState": CdrField(4, 0, "f"),  # voltage
+    "as2_msgs/msg/Thrust": CdrField(4, 0, "f"),  # thrust
+    # connected, armed, offboard -> status.state
+    "as2_msgs/msg/PlatformInfo": CdrField(1, 3, "b"),
+    # pose.position.x, pose.position.y -> pose.position.z
+    "geometry_msgs/msg/PoseStamped": CdrField(8, 16, "d"),
+}
+
+
+def decode_cdr_field(msg: bytes, cdr_field: CdrField) -> tuple[int, float] | None:
+    """
+    Decode the header stamp and a single field of a serialized message
+
+    :param msg: CDR serialized message
+    :param cdr_field: Location of the field
+    :return: (stamp in ns, value) or None if the message is not plain CDR
+    """
+    # Encapsulation: 0x0000 CDR big endian, 0x0001 CDR little endian
+    if len(msg) < 16 or msg[0] != 0 or msg[1] not in (0, 1):
+        return None
+    endian = '<' if msg[1] == 1 else '>'
+    # Alignment is relative to the payload, that starts after the 4 byte encapsulation
+    sec, nanosec, frame_id_length = struct.unpack_from(endian + 'iII', msg, 4)
+    position = 12 + frame_id_length
+    position += -position % cdr_field.alignment
+    value, = struct.unpack_from(endian + cdr_field.fmt, msg, 4 + position + cdr_field.offset)
+    return sec * 1_000_000_000 + nanosec, value
+
+
+def series_decoder(type_name: str, series_topic: SeriesTopic) -> Callable[[bytes], tuple[int, float]]:
+    """
+    Get the function that extracts (stamp in ns, value) from a serialized message
+
+    :param type_name: Message type, e.g. "sensor_msgs/msg/Imu"
+    :param series_topic: Extracted field
+    :return: Decoder function
+    """
+    cdr_field = CDR_FIELDS.get(type_name)
+
+    def decode(msg: bytes) -> tuple[int, float]:
+        if cdr_field is not None:
+            try:
+                decoded = decode_cdr_field(msg, cdr_field)
+            except struct.error:
+                decoded = None
+            if decoded is not None:
+                return decoded
+        return series_topic.getter(deserialize_message(msg, series_topic.msg_type))
+
+    return decode
+
+
+def merge_time_windows(windows: list[tuple[int, int]], margin_ns: int) -> list[tuple[int, int]]:
+    """
+    Widen the time windows by a margin and join the ones that overlap
+
+    :param windows: List of (start, end) in ns
+    :param margin_ns: Margin added on both sides of each window
+    :return: Sorted list of disjoint (start, end) in ns
+    """
+    merged = []
+    for start, end in sorted(windows):
+        start, end = start - margin_ns, end + margin_ns
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def read_messages(bag_reader: SequentialReader,
+                  time_windows: list[tuple[int, int]] = None) -> Iterator[tuple[str, bytes, int]]:
+    """
+    Read the messages of an opened rosbag, optionally only inside some time windows
+
+    :param bag_reader: Opened rosbag reader
+    :param time_windows: Sorted list of disjoint (start, end) in ns, compared with the time
+    the messages were recorded. If None, all the messages are read.
+    :return: Generator of (topic, serialized message, timestamp in ns)
+    """
+    if time_windows is None:
+        while bag_reader.has_next():
+            yield bag_reader.read_next()
+        return
+
+    for start, end in time_windows:
+        bag_reader.seek(start)
+        while bag_reader.has_next():
+            message = bag_reader.read_next()
+            if message[2] > end:
+                break
+            yield message
+
+
+def read_rosbag_series(filename: str, topics: Iterable[str] = None, cache: SeriesCache = None,
+                       time_windows: list[tuple[int, int]] = None) -> dict[str, TimeSeries]:
+    """
+    Read the fields of SERIES_TOPICS from a rosbag as time series
+
+    :param filename: Rosbag path
+    :param topics: Subset of SERIES_TOPICS to read. If None, all of them are read.
+    :param cache: Cache of the series already read. If None, the rosbag is always read.
+    :param time_windows: Sorted list of disjoint (start, end) in ns to read. If None, the
+    whole rosbag is read.
+    :return: SeriesTopic attribute -> time series
+    """
+    if topics is None:
+        topics = SERIES_TOPICS.keys()
+    topics = list(topics)
+    variant = '' if time_windows is None else f"time_windows:{time_windows}"
+
+    if cache is not None:
+        series = cache.load(Path(filename), topics, variant)
+        if series is not None:
+            return series
+
+    bag_reader = open_rosbag(filename)
+    # Full topic name -> (attribute, decoder)
+    decoders = {}
+    for metadata in bag_reader.get_all_topics_and_types():
+        key = next((key for key in topics if key in metadata.name), None)
+        if key is not None:
+            series_topic = SERIES_TOPICS[key]
+            decoders[metadata.name] = (series_topic.attribute,
+                                       series_decoder(metadata.type, series_topic))
+
+    stamps = {SERIES_TOPICS[key].attribute: array('q') for key in topics}
+    values = {SERIES_TOPICS[key].attribute: array('d') for key in topics}
+    if decoders:
+        bag_reader.set_filter(StorageFilter(topics=list(decoders)))
+        for topic, msg, _ in read_messages(bag_reader, time_windows):
+            attribute, decode = decoders[topic]
+            stamp, value = decode(msg)
+            stamps[attribute].append(stamp)
+            values[attribute].append(value)
+
+    # The messages are stored in the order they were received, so the header stamps can go back
+    series = {attribute: TimeSeries.from_unsorted(np.frombuffer(stamps[attribute], dtype=np.int64),
+                                                  np.frombuffer(values[attribute], dtype=np.float64))
+              for attribute in stamps}
+    if cache is not None:
+        cache.save(Path(filename), topics, series, variant)
+    return series
+
+
+def flying_windows(platform_info: TimeSeries, envelope: bool = False) -> list[tuple[int, int]]:
+    """
+    Get the time windows where the platform is flying (status == 3)
+
+    :param platform_info: Platform status
+    :param envelope: If True, return a single window from the first to the last flying status
+    :return: List of (start, end) in ns
+    """
+    flying = platform_info.value == FLYING_STATUS
+    if not flying.any():
+        return []
+    edges = np.diff(flying.astype(np.int8))
+    starts = np.flatnonzero(edges == 1) + 1
+    ends = np.flatnonzero(edges == -1)
+    if flying[0]:
+        starts = np.concatenate(([0], starts))
+    if flying[-1]:
+        ends = np.concatenate((ends, [len(flying) - 1]))
+    if envelope:
+        starts, ends = starts[:1], ends[-1:]
+    return list(zip(platform_info.stamp_ns[starts].tolist(), platform_info.stamp_ns[ends].tolist()))
+
+
+def read_rosbag_flying_series(filename: str, topics: Iterable[str] = None,
+                              cache: SeriesCache = None, envelope: bool = True,
+                              margin_s: float = 1.0) -> dict[str, TimeSeries]:
+    """
+    Read the fields of SERIES_TOPICS from a rosbag only while the platform is flying.
+
+    The platform status is read first to find the flying windows, then the rest of the
+    topics are read only inside them, so the data recorded on the ground is never decoded.
+
+    :param filename: Rosbag path
+    :param topics: Subset of SERIES_TOPICS to read. If None, all of them are read.
+    :param cache: Cache of the series already read
+    :param envelope: If True, read from the first to the last flying status, otherwise only
+    inside each flying window
+    :param margin_s: Margin added to the windows, since they come from the header stamps and
+    the messages are recorded some time later
+    :return: SeriesTopic attribute -> time series. The platform status is always complete.
+    If nothing is read inside the windows, e.g. because the header stamps and the recording
+    time come from different clocks, the whole rosbag is read with a warning.
+    """
+    if topics is None:
+        topics = SERIES_TOPICS.keys()
+    topics = list(topics)
+    status_topics = [key for key in topics if SERIES_TOPICS[key].attribute == 'platform_info']
+    other_topics = [key for key in topics if key not in status_topics]
+
+    status = read_rosbag_series(filename, STATUS_TOPICS, cache)
+    windows = merge_time_windows(flying_windows(status['platform_info'], envelope),
+                                 int(margin_s * 1e9))
+    series = read_rosbag_series(filename, other_topics, cache, windows)
+    if windows and other_topics and all(len(s) == 0 for s in series.values()):
+        print(f"WARNING: No messages of {filename} were recorded while flying, the header stamps "
+              "may use another clock (e.g. sim time). The whole rosbag is read")
+        series = read_rosbag_series(filename, other_topics, cache)
+    if status_topics:
+        series.update(status)
+    return series
+
+
 def deserialize_tfs(tfs: list[TFMessage], buffer: Buffer) -> Buffer:
     """Deserialize TF messages"""
     for tf in tfs:
@@ -99,33 +419,74 @@ class LogData:
     platform_info: PlatformInfo = field(default_factory=PlatformInfo)
     rc_command: list[UInt16MultiArrayStamped] = field(default_factory=list)
     self_localization: list[PoseStamped] = field(default_factory=list)
+    position: list[PoseStamped] = field(default_factory=list)
 
     @classmethod
-    def from_rosbag(cls, rosbag: Path) -> 'LogData':
-        """Read the rosbag"""
+    def from_rosbag(cls, rosbag: Path, topics: Iterable[str] = None) -> 'LogData':
+        """
+        Read the rosbag
+
+        :param rosbag: Rosbag path
+        :param topics: Subset of LOG_TOPICS to read. If None, all of them are read.
+        """
         log_data = cls(rosbag)
-        rosbag_msgs = read_rosbag(str(rosbag))
-
-        for topic, msgs in rosbag_msgs.items():
-            if "actuator_command/thrust" in topic:
-                log_data.thrust = deserialize_msgs(msgs, Thrust)
-            elif "sensor_measurements/imu" in topic:
-                log_data.imu = deserialize_msgs(msgs, Imu)
-            elif "sensor_measurements/battery" in topic:
-                log_data.battery = deserialize_msgs(msgs, BatteryState)
-            elif "debug/controller_reference" in topic:
-                log_data.controller_reference = deserialize_msgs(msgs, Vector3Stamped)
-            elif "debug/controller_state" in topic:
-                log_data.controller_state = deserialize_msgs(msgs, Vector3Stamped)
-            elif "debug/rc/command" in topic:
-                log_data.rc_command = deserialize_msgs(msgs, UInt16MultiArrayStamped)
-            elif "platform/info" in topic:
-                log_data.platform_info = deserialize_msgs(msgs, PlatformInfo)
-            elif "self_localization/pose" in topic:
-                log_data.position = deserialize_msgs(msgs, PoseStamped)
+        if topics is None:
+            topics = LOG_TOPICS.keys()
+        topics = list(topics)
+
+        # Full topic name -> (attribute, message type), resolved on the first message
+        topic_fields = {}
+        for topic, msg, _ in stream_rosbag(str(rosbag), topics):
+            if topic not in topic_fields:
+                key = next(key for key in topics if key in topic)
+                attribute, msg_type = LOG_TOPICS[key]
+                setattr(log_data, attribute, [])
+                topic_fields[topic] = (getattr(log_data, attribute), msg_type)
+            msgs, msg_type = topic_fields[topic]
+            msgs.append(deserialize_message(msg, msg_type))
         return log_data
 
 
+@dataclass
+class LogSeries:
+    """Time series read from rosbag file"""
+    filename: Path
+    thrust: TimeSeries = field(default_factory=TimeSeries.empty)
+    imu: TimeSeries = field(default_factory=TimeSeries.empty)
+    battery: TimeSeries = field(default_factory=TimeSeries.empty)
+    rc_command: TimeSeries = field(default_factory=TimeSeries.empty)
+    platform_info: TimeSeries = field(default_factory=TimeSeries.empty)
+    position: TimeSeries = field(default_factory=TimeSeries.empty)
+
+    @classmethod
+    def from_rosbag(cls, rosbag: Path, topics: Iterable[str] = None,
+                    cache: SeriesCache = None, flying_only: bool = False) -> 'LogSeries':
+        """
+        Read the rosbag
+
+        :param rosbag: Rosbag path
+        :param topics: Subset of SERIES_TOPICS to read. If None, all of them are read.
+        :param cache: Cache of the series already read
+        :param flying_only: If True, only read the data from the first to the last flying
+        status, except for the platform status
+        """
+        if flying_only:
+            return cls(rosbag, **read_rosbag_flying_series(str(rosbag), topics, cache))
+        return cls(rosbag, **read_rosbag_series(str(rosbag), topics, cache))
+
+    @classmethod
+    def merge(cls, logs: list['LogSeries']) -> 'LogSeries':
+        """
+        Merge the time series of several rosbags into one dataset ordered by time
+
+        :param logs: Time series read from each rosbag
+        """
+        filename = Path(os.path.commonpath([log.filename for log in logs])) if logs else Path()
+        return cls(filename, **{
+            attribute.name: TimeSeries.concatenate([getattr(log, attribute.name) for log in logs])
+            for attribute in fields(cls) if attribute.name != 'filename'})
+
+
 if __name__ == "__main__":
 
     # info = read_rosbag("rosbags/030625-ThrustMap-Test/hover_subir_1/flight_21")
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+
+# Copyright 2025 Universidad Politécnica de Madrid
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer in the
+#      documentation and/or other materials provided with the distribution.
+#
+#    * Neither the name of the Universidad Politécnica de Madrid nor the names of its
+#      contributors may be used to endorse or promote products derived from
+#      this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+""" Evaluate several strategies on several experiment folders in parallel and summarize their errors"""
+
+__authors__ = 'Carmen De Rojas Pita-Romero'
+__copyright__ = 'Copyright (c) 2025 Universidad Politécnica de Madrid'
+__license__ = 'BSD-3-Clause'
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+import argparse
+import os
+import pandas as pd
+import yaml
+import csv_utils as csvr
+import get_results_from_csv as results
+from config_utils import csv_options, cf_parameters_list, tm_parameters_list
+
+# Method of GetResultsFromCSV that computes the throttle of each strategy
+STRATEGIES = {
+    'linear': 'linear_aproximation',
+    'thrust_map': 'thrustmap_without_correction_factor',
+    'thrust_map_cf': 'thrustmap_with_correction_factor',
+}
+# Strategies that use the correction factor given in cf_parameters
+CF_STRATEGIES = ['linear', 'thrust_map_cf']
+# Keys of the config that a run can override
+RUN_DEFAULTS = ['mass', 'tm_parameters', 'cf_parameters', 't_max']
+
+
+def stats_columns(prefix: str, stats) -> dict:
+    """Columns of the summary with the statistics of an error"""
+    return {f'{prefix}_mean': stats.mean, f'{prefix}_std': stats.std, f'{prefix}_rmse': stats.rmse,
+            f'{prefix}_p95': stats.percentiles.get(95), f'{prefix}_unmatched': stats.unmatched_first}
+
+
+def run_strategy(run: dict, options: dict) -> dict:
+    """
+    Evaluate one strategy on the unified CSV of one experiment folder and save its errors
+
+    :param run: Name, folder, strategy and parameters of the run
+    :param options: Options of the CSVResults that save the errors
+    :return: Row of the summary
+    """
+    compute_results = results.GetResultsFromCSV(
+        f"data/results/{run['folder']}", tm_parameters_list(run['tm_parameters']) if run.get('tm_parameters') else None,
+        cf_parameters_list(run.get('cf_parameters')), run.get('t_max'), run.get('mass'),
+        csvr.CSVResults(**options), plot=False)
+    getattr(compute_results, STRATEGIES[run['strategy']])()
+    compute_results.compute_error(run['name'])
+
+    cf_parameters = compute_results.cf_parameters
+    row = {'name': run['name'], 'folder': run['folder'], 'strategy': run['strategy'],
+           'samples': len(compute_results.data)}
+    # Named as the keys of cf_parameters in the config: a0 is the coefficient of the highest degree
+    cf_parameters = list(cf_parameters) if cf_parameters is not None else []
+    row.update({f'cf_a{len(cf_parameters) - 1 - i}': value for i, value in enumerate(cf_parameters)})
+    row.update(stats_columns('throttle_error', compute_results.error_throttle_stats))
+    row.update(stats_columns('thrust_error', compute_results.error_thrust_stats))
+    return row
+
+
+def load_runs(config: dict) -> list[dict]:
+    """
+    Runs of the config, with the values not set in a run taken from the top level of the config
+
+    :param config: Batch config
+    :return: List of runs
+    """
+    runs = []
+    for run in config.get('runs', []):
+        run = {**{key: config.get(key) for key in RUN_DEFAULTS}, **run}
+        run.setdefault('name', run['folder'])
+        if run['strategy'] not in STRATEGIES:
+            raise ValueError(f"Unknown strategy '{run['strategy']}' in run '{run['name']}', it must be one of {list(STRATEGIES)}")
+        if run['strategy'] in CF_STRATEGIES and not run.get('cf_parameters'):
+            raise ValueError(f"Run '{run['name']}' with strategy '{run['strategy']}' needs cf_parameters")
+        runs.append(run)
+    return runs
+
+
+def run_batch(runs: list[dict], options: dict, max_workers: int = None, unify: bool = True) -> pd.DataFrame:
+    """
+    Evaluate all the runs in parallel
+
+    :param runs: Runs to evaluate
+    :param options: Options of the CSVResults that read and save the results
+    :param max_workers: Number of processes. If None, the number of CPUs.
+    :param unify: If True, unify the CSVs of each folder before evaluating the runs
+    :return: Summary with a row per run that finished
+    """
+    if unify:
+        csv = csvr.CSVResults(**options)
+        for folder in dict.fromkeys(run['folder'] for run in runs):
+            csv.unify_csvs(f"data/{folder}", "data/results", f"{folder}.csv")
+
+    rows = []
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(run_strategy, run, options): run for run in runs}
+        for future in as_completed(futures):
+            try:
+                rows.append(future.result())
+            except Exception as e:
+                print(f"[ERROR] Run '{futures[future]['name']}' failed: {e}")
+    order = {run['name']: i for i, run in enumerate(runs)}
+    rows.sort(key=lambda row: order[row['name']])
+    return pd.DataFrame(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--config',
+                        type=str,
+                        default='correction_factor/config/batch_default.yaml',
+                        help="Batch config file path")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.config):
+        raise FileNotFoundError(f"Config file does not exist: {args.config}")
+    with open(args.config, 'r') as file:
+        config = yaml.safe_load(file)
+
+    summary = run_batch(load_runs(config), csv_options(config), config.get('max_workers'),
+                        config.get('unify', True))
+    summary_file = Path(config.get('summary_file', 'data/summary.csv'))
+    summary_file.parent.mkdir(parents=True, exist_ok=True)
+    summary.to_csv(summary_file, index=False)
+    print(summary.to_string(index=False))
+    print(f"Summary saved in {summary_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -32,8 +32,8 @@ __authors__ = 'Carmen De Rojas Pita-Romero'
 __copyright__ = 'Copyright (c) 2025 Universidad Politécnica de Madrid'
 __license__ = 'BSD-3-Clause'
 
+from bisect import bisect_left
 import numpy as np
-import pandas as pd
 from std_msgs.msg import Header, UInt16MultiArray
 from typing import Any
 from sensor_msgs.msg import Imu, BatteryState
@@ -41,6 +41,17 @@ from as2_msgs.msg import Thrust, PlatformInfo, UInt16MultiArrayStamped
 from geometry_msgs.msg import PoseStamped
 from disturbance_estimation import DisturbanceEstimation
 from scipy.optimize import curve_fit
+from time_series import TimeSeries, as_arrays
+from alignment import align_to_windows, hold, match_nearest
+from error_stats import ErrorStats
+from resampling import resample_uniform
+from numpy.polynomial.polynomial import polyval
+from polynomial_fit import PolynomialFit, fit_polynomial
+
+# Index returned when there is no message at or after the time searched
+NOT_FOUND = -1
+# as2_msgs/PlatformStatus FLYING state
+FLYING_STATUS = 3
 
 
 def timestamp_to_float(header: Header) -> float:
@@ -50,14 +61,46 @@ def timestamp_to_float(header: Header) -> float:
     return header.stamp.sec + header.stamp.nanosec * 1e-9
 
 
-def time_to_index(time: float, msgs_stamped: list[Any]) -> int:
+def time_to_index(time: float, msgs_stamped: list[Any] | TimeSeries) -> int:
+    """
+    Get index from time, with a binary search
+
+    :param time: Time in seconds
+    :param msgs_stamped: List of (time, value) sorted by time, e.g. with sort_by_time, or
+    TimeSeries
+    :return: Index of the first message at or after time, NOT_FOUND if there is none
+    """
+    if isinstance(msgs_stamped, TimeSeries):
+        return stamp_to_index(round(time * 1e9), msgs_stamped.stamp_ns)
+    index = bisect_left(msgs_stamped, time, key=lambda msg: msg[0])
+    return index if index < len(msgs_stamped) else NOT_FOUND
+
+
+def sort_by_time(msgs_stamped: list[Any]) -> tuple[list[Any], np.ndarray]:
+    """
+    Sort a list of (time, value) by time, if it is not sorted yet
+
+    :param msgs_stamped: List of (time, value)
+    :return: (sorted list, its times)
     """
-    Get index from time
+    times = np.fromiter((msg[0] for msg in msgs_stamped), dtype=np.float64, count=len(msgs_stamped))
+    if np.any(times[1:] < times[:-1]):
+        order = np.argsort(times, kind='stable')
+        msgs_stamped = [msgs_stamped[i] for i in order]
+        times = times[order]
+    return msgs_stamped, times
+
+
+def stamp_to_index(stamp_ns: int, stamps_ns: np.ndarray) -> int:
     """
-    for i, msg in enumerate(msgs_stamped):
-        if msg[0] >= time:
-            return i
-    return -1
+    Get index from a stamp, with a binary search
+
+    :param stamp_ns: Stamp, e.g. in ns
+    :param stamps_ns: Sorted stamps in the same unit, e.g. the ones of a TimeSeries
+    :return: Index of the first stamp at or after stamp_ns, NOT_FOUND if there is none
+    """
+    index = int(np.searchsorted(stamps_ns, stamp_ns, side='left'))
+    return index if index < len(stamps_ns) else NOT_FOUND
 
 
 class ResultsComputer:
@@ -145,19 +188,47 @@ class ResultsComputer:
         """
         Filter time intervals where the platform is flying.
 
-        :param data: List of (time, status)
-        :return: List of (time, status) where the platform is flying
+        :param data: List of (time, status) or TimeSeries
+        :return: List of (time, status) or TimeSeries where the platform is flying
         """
+        if isinstance(data, TimeSeries):
+            flying = data.value == FLYING_STATUS
+            return TimeSeries(data.stamp_ns[flying], data.value[flying])
         flying_data = []
         for (t, value) in data:
-            if value == 3:
+            if value == FLYING_STATUS:
                 flying_data.append((t, value))
         return flying_data
 
     def adjust_time_limits(self, limiting_data, data):
-        t_0 = time_to_index(limiting_data[0][0], data)
-        t_f = time_to_index(limiting_data[-1][0], data)
+        """
+        Cut the data to the time limits of another data
 
+        :param limiting_data: List of (time, value) or TimeSeries. Its first and last times are
+        the limits.
+        :param data: List of (time, value), sorted here if needed, or TimeSeries
+        :return: Data from the first sample at or after the first limit to the last sample
+        before the last limit. A TimeSeries is sliced without copying.
+        """
+        if isinstance(limiting_data, TimeSeries) and isinstance(data, TimeSeries):
+            t_0 = stamp_to_index(limiting_data.stamp_ns[0], data.stamp_ns)
+            t_f = stamp_to_index(limiting_data.stamp_ns[-1], data.stamp_ns)
+        elif isinstance(data, TimeSeries):
+            t_0 = time_to_index(limiting_data[0][0], data)
+            t_f = time_to_index(limiting_data[-1][0], data)
+        else:
+            # Sort a list once, then search it with its times
+            data, times = sort_by_time(data)
+            t_0 = stamp_to_index(limiting_data[0][0], times)
+            t_f = stamp_to_index(limiting_data[-1][0], times)
+
+        if t_0 == NOT_FOUND:
+            # All the data is before the limits
+            return data[:0]
+        if t_f == NOT_FOUND:
+            # All the data after the first limit is inside the limits. The last sample is
+            # left out, as it always has been.
+            t_f = len(data) - 1
         return data[t_0:t_f]
 
     def synchronize_two_data(self, data1, data2):
@@ -169,29 +240,10 @@ class ResultsComputer:
         :param data2: List of (time,value)
         :return: data1 resample
         """
-        sample_data = []
-        data1_iter = iter(data1)
-        current = next(data1_iter, None)
-
-        for (t_start, _), (t_end, _) in zip(data2, data2[1:]):
-            window_values = []
-
-            while current is not None:
-                t_data1, value = current
-
-                if t_data1 < t_start:
-                    current = next(data1_iter, None)
-                elif t_start <= t_data1 < t_end:
-                    window_values.append(value)
-                    current = next(data1_iter, None)
-                else:
-                    break
-
-            if window_values:
-                mean_val = np.mean(window_values)
-                sample_data.append((t_start, mean_val))
-
-        return sample_data
+        time1, value1 = as_arrays(data1)
+        time2, _ = as_arrays(data2)
+        times, values = align_to_windows(time1, value1, time2, 'mean')
+        return list(zip(times.tolist(), values.tolist()))
 
     def fz_sample(self, data, freq_hz):
         """
@@ -201,14 +253,22 @@ class ResultsComputer:
          :param freq_hz: Desired frequency in Hz
          :return: sample data
          """
-        times, values = zip(*data)
-        df = pd.DataFrame({'value': values}, index=pd.to_datetime(times, unit='s'))
-        period_ms = int(1000 / freq_hz)
-        df_resampled = df.resample(f'{period_ms}ms').mean().interpolate()
-        new_times = df_resampled.index.astype('int64') / 1e9
-        new_values = df_resampled['value'].tolist()
-        sample_data = list(zip(new_times, new_values))
-        return sample_data
+        if not isinstance(data, TimeSeries):
+            data = TimeSeries.from_list(data)
+        stamps, (values,) = resample_uniform([data], freq_hz)
+        return TimeSeries(stamps, values).to_list()
+
+    def fz_sample_all(self, data_list: list[TimeSeries], freq_hz: float) -> list[TimeSeries]:
+        """
+        Sample several time series to the same uniform frequency, so all of them share the
+        same timestamps.
+
+        :param data_list: List of TimeSeries
+        :param freq_hz: Desired frequency in Hz
+        :return: List of sampled TimeSeries
+        """
+        stamps, columns = resample_uniform(data_list, freq_hz)
+        return [TimeSeries(stamps, values) for values in columns]
 
     def resize_data(self, long_data, short_data):
         """
@@ -226,17 +286,10 @@ class ResultsComputer:
             base = short_data
             source = long_data
 
-        sample_data = []
-        idx = 0
-        last_value = source[0][1]
-
-        for t_base, _ in base:
-            while idx < len(source) and source[idx][0] <= t_base:
-                last_value = source[idx][1]
-                idx += 1
-            sample_data.append((t_base, last_value))
-
-        return sample_data
+        base_time, _ = as_arrays(base)
+        source_time, source_value = as_arrays(source)
+        values = hold(source_time, source_value, base_time)
+        return list(zip(base_time.tolist(), values.tolist()))
 
     def func_1st_order(self, x, a1, a2):
         """ 
@@ -271,13 +324,28 @@ class ResultsComputer:
         popt, pcov = curve_fit(func, xdata, ydata)
         return popt
 
-    def get_parameters(self, data, grade):
-        if grade == 1:
-            return self.fit_curve(data, self.func_1st_order)
-        elif grade == 2:
-            return self.fit_curve(data, self.func_2nd_order)
-        elif grade == 3:
-            return self.fit_curve(data, self.func_3rd_order)
+    def fit_polynomial(self, data, grade, weights=None) -> PolynomialFit:
+        """
+        Fit a polynomial to the data with linear least squares.
+
+        :param data: List of (x, y) data points
+        :param grade: Degree of the polynomial
+        :param weights: Weight of each data point. If None, all of them weight the same.
+        :return: Fitted polynomial, with its coefficients, covariance and residuals
+        """
+        xdata, ydata = as_arrays(data)
+        return fit_polynomial(xdata, ydata, grade, weights)
+
+    def get_parameters(self, data, grade, weights=None):
+        """
+        Fit a polynomial to the data, e.g. the correction factor γ(B).
+
+        :param data: List of (x, y) data points
+        :param grade: Degree of the polynomial
+        :param weights: Weight of each data point. If None, all of them weight the same.
+        :return: Coefficients from the lowest degree, as the parameters of func_*_order
+        """
+        return self.fit_polynomial(data, grade, weights).coefficients
 
     def run_correction_factor(self, send_thrust, measured_thrust, battery, mass) -> list[tuple[float, float]]:
         """
@@ -287,16 +355,22 @@ class ResultsComputer:
         :param measured_thrust: Measured thrust
         :return: List(time, correction_factor)
         """
+        _, value_send = as_arrays(send_thrust)
+        _, value_measured = as_arrays(measured_thrust)
+        _, voltage = as_arrays(battery)
+        n = min(len(value_send), len(value_measured), len(voltage))
+        factor = self.correction_factor_array(value_send[:n], value_measured[:n])
+        return list(zip(voltage[:n].tolist(), factor.tolist()))
+
+    def correction_factor_array(self, send_thrust: np.ndarray, measured_thrust: np.ndarray) -> np.ndarray:
+        """
+        Correction factor γ = thrust commanded / thrust measured
 
-        DE = DisturbanceEstimation(mass)
-        correction_factor_list = []
-        for (t_send, value_send), (_, value_measured), (_, voltage) in zip(send_thrust, measured_thrust, battery):
-
-            factor = DE.compute_correction_factor_thrust(
-                value_send, value_measured)
-            correction_factor_list.append((voltage, factor))
-
-        return correction_factor_list
+        :param send_thrust: Thrust from the actuator
+        :param measured_thrust: Measured thrust
+        :return: Correction factor of each sample
+        """
+        return DisturbanceEstimation.correction_factor_from_thrust(send_thrust, measured_thrust)
 
     def run_thrust_reference(self, param1, real_mass):
         """
@@ -306,16 +380,26 @@ class ResultsComputer:
         :param real_mass: Dependent parameter
         :return: List[(time, thrust_value)]
         """
-        DE = DisturbanceEstimation(real_mass)
+        time, aceleration = as_arrays(param1)
+        time, thrust = self.thrust_reference_array(time, aceleration, real_mass)
+        return list(zip(time.tolist(), thrust.tolist()))
 
-        thrust_measure = []
-        for value in param1:
-            if np.isnan(value[1]):
-                pass
-            else:
-                value_measure = DE.compute_thrust(real_mass, value[1])
-                thrust_measure.append((value[0], value_measure))
-        return thrust_measure
+    def thrust_reference_array(self, time: np.ndarray, aceleration: np.ndarray,
+                               real_mass: float) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Compute the thrust reference based on the real mass and the IMU (a_z). Samples with NaN
+        acceleration are left out.
+
+        :param time: Time of each sample
+        :param aceleration: acelerration_z from IMU
+        :param real_mass: Mass of the drone
+        :return: (time, thrust)
+        """
+        time = np.asarray(time)
+        aceleration = np.asarray(aceleration, dtype=np.float64)
+        valid = ~np.isnan(aceleration)
+        thrust = DisturbanceEstimation.thrust_from_acceleration(real_mass, aceleration[valid])
+        return time[valid], thrust
 
     def data1_vs_data2(self, data1: list[(float, float)], data2: list[(float, float)]) -> list[(float, float)]:
         """
@@ -339,20 +423,26 @@ class ResultsComputer:
         :param flag: False is to correct the thrust commanded and look if they is similar to the thrust measured.
         :return: Thrust input: List(time, value)
         """
-        thrust_input = []
-        for (t, thrust_value), (_, voltage) in zip(thrust, battery):
-            if len(parameters) == 2:
-                y = self.func_1st_order(voltage, *parameters)
-            elif len(parameters) == 3:
-                y = self.func_2nd_order(voltage, *parameters)
-            elif len(parameters) == 4:
-                y = self.func_3rd_order(voltage, *parameters)
-            if flag:
-                thrust_value = thrust_value * y
-            else:
-                thrust_value = thrust_value / y
-            thrust_input.append((t, thrust_value))
-        return thrust_input
+        t, thrust_value = as_arrays(thrust)
+        _, voltage = as_arrays(battery)
+        n = min(len(t), len(voltage))
+        thrust_value = self.compute_thrust_array(thrust_value[:n], voltage[:n], parameters, flag)
+        return list(zip(t[:n].tolist(), thrust_value.tolist()))
+
+    def compute_thrust_array(self, thrust: np.ndarray, voltage: np.ndarray, parameters, flag) -> np.ndarray:
+        """
+        Correct the thrust with the polynomial correction factor γ(B)
+
+        :param thrust: Thrust of each sample
+        :param voltage: Battery voltage of each sample
+        :param parameters: Parameters of the polynomial correction factor, lowest degree first
+        :param flag: If True, multiply the thrust by γ(B), otherwise divide it
+        :return: Corrected thrust
+        """
+        y = polyval(np.asarray(voltage, dtype=np.float64), parameters)
+        if flag:
+            return np.asarray(thrust, dtype=np.float64) * y
+        return np.asarray(thrust, dtype=np.float64) / y
 
     def compute_throttle(self, thrust_commanded, battery, parameters, flag_corrected, thrust_map):
         """
@@ -365,50 +455,82 @@ class ResultsComputer:
         :param number_motors: Number of motors to change the current thrust map. If -1, it will use the linear aproximation.
         :return: List of throttle (time,value)
         """
+        t, thrust_value = as_arrays(thrust_commanded)
+        _, voltage = as_arrays(battery)
+        n = min(len(t), len(voltage))
+        throttle = self.compute_throttle_array(
+            thrust_value[:n], voltage[:n], parameters, flag_corrected, thrust_map)
+        return list(zip(t[:n].tolist(), throttle.tolist()))
+
+    def compute_throttle_array(self, thrust: np.ndarray, voltage: np.ndarray, parameters,
+                               flag_corrected, thrust_map) -> np.ndarray:
+        """
+        Compute the throttle of each sample from the thrust and voltage
+
+        :param thrust: Thrust commanded by the controller
+        :param voltage: Battery voltage
+        :param parameters: Parameters of the polynomial correction factor
+        :param flag_corrected: If True, the thrust input will be corrected with correction factor
+        :param thrust_map: Parameters of the thrust map. If None, it will use the linear aproximation.
+        :return: Throttle
+        """
+        voltage = np.asarray(voltage, dtype=np.float64)
         if flag_corrected:
-            thrust_input = self.compute_thrust(
-                thrust_commanded, battery, parameters, flag_corrected)
+            thrust_input = self.compute_thrust_array(thrust, voltage, parameters, flag_corrected)
         else:
-            thrust_input = thrust_commanded
-        if thrust_map == None:
-            throttle_list = []
+            thrust_input = np.asarray(thrust, dtype=np.float64)
+        if thrust_map is None:
             thrust_max = 44
-            for (t, thrust_value), (_, voltage_value) in zip(thrust_input, battery):
-                value = (thrust_value / thrust_max) * 1000 + 1000  # throttle (1000-2000)
-                throttle_list.append((t, value))
-                if np.isnan(value):
-                    print(f"NaN value at: Thrust {thrust_value}, Voltage {voltage_value}")
-            return throttle_list
+            throttle = (thrust_input / thrust_max) * 1000 + 1000  # throttle (1000-2000)
         else:
             tm_parameters = thrust_map
-            throttle_list = []
-            for (t, thrust_value), (_, voltage_value) in zip(thrust_input, battery):
-                thrust_input = thrust_value / 4
-                value = tm_parameters[0] + tm_parameters[1] * thrust_input + tm_parameters[2] * voltage_value + tm_parameters[3] * thrust_input * thrust_input + \
-                    tm_parameters[4] * thrust_input * voltage_value + \
-                    tm_parameters[5] * voltage_value * voltage_value
-                throttle_list.append((t, value))
-                if np.isnan(value):
-                    print(f"NaN value at: Thrust {thrust_input}, Voltage {voltage_value}")
-            return throttle_list
-
-    def compute_error(self, data1, data2):
+            thrust_input = thrust_input / 4
+            throttle = tm_parameters[0] + tm_parameters[1] * thrust_input + tm_parameters[2] * voltage + tm_parameters[3] * thrust_input * thrust_input + \
+                tm_parameters[4] * thrust_input * voltage + \
+                tm_parameters[5] * voltage * voltage
+        for i in np.flatnonzero(np.isnan(throttle)):
+            print(f"NaN value at: Thrust {thrust_input[i]}, Voltage {voltage[i]}")
+        return throttle
+
+    def compute_error(self, data1, data2, tolerance: float = None):
         """
         Compute the error between two data sets
 
         :param data1: List of (time, value)
         :param data2: List of (time, value)
+        :param tolerance: Maximum time difference between the samples compared. If None, half
+            the sample period of data2
         :return: List of (time, error)
         """
-        error_list = []
-        mean_error = []
-
-        for (t1, v1), (t2, v2) in zip(data1, data2):
-            if t1 == t2:
-                error = (np.abs(v1 - v2) / 10)
-                if np.isnan(error):
-                    print(v1, v2)
-                error_list.append((t1, error))
-                mean_error.append(error)
-        print(f"Error : {np.mean(mean_error)} ± {np.std(mean_error)}")
-        return error_list
+        t1, v1 = as_arrays(data1)
+        t2, v2 = as_arrays(data2)
+        t, error, stats = self.compute_error_array(t1, v1, t2, v2, tolerance)
+        print(f"Error : {stats}")
+        return list(zip(t.tolist(), error.tolist()))
+
+    def compute_error_array(self, time1: np.ndarray, value1: np.ndarray, time2: np.ndarray,
+                            value2: np.ndarray, tolerance: float = None,
+                            return_indices: bool = False) -> tuple[np.ndarray, np.ndarray, ErrorStats]:
+        """
+        Compute the error between two data sets, sample by sample. Each sample of the first
+        data set is compared with the sample of the second one nearest in time, if it is within
+        the tolerance. Samples without a pair are left out and counted in the statistics.
+
+        :param time1: Times of the first data set
+        :param value1: Values of the first data set
+        :param time2: Times of the second data set
+        :param value2: Values of the second data set
+        :param tolerance: Maximum time difference between the samples compared. If None, half
+            the sample period of the second data set
+        :param return_indices: If True, the indices of the matched samples in the first data set
+            are returned too
+        :return: (time, error, statistics of the error), and the indices if return_indices
+        """
+        index1, index2 = match_nearest(time1, time2, tolerance)
+        value1 = np.asarray(value1, dtype=np.float64)[index1]
+        value2 = np.asarray(value2, dtype=np.float64)[index2]
+        error = np.abs(value1 - value2) / 10
+        stats = ErrorStats.from_errors(error, len(time1) - len(index1), len(time2) - len(index2))
+        if return_indices:
+            return np.asarray(time1)[index1], error, stats, index1
+        return np.asarray(time1)[index1], error, stats
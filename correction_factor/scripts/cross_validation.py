@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+
+# Copyright 2025 Universidad Politécnica de Madrid
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer in the
+#      documentation and/or other materials provided with the distribution.
+#
+#    * Neither the name of the Universidad Politécnica de Madrid nor the names of its
+#      contributors may be used to endorse or promote products derived from
+#      this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+""" Leave-one-flight-out cross-validation of the correction factor γ(B) """
+
+__authors__ = 'Carmen De Rojas Pita-Romero'
+__copyright__ = 'Copyright (c) 2025 Universidad Politécnica de Madrid'
+__license__ = 'BSD-3-Clause'
+
+from pathlib import Path
+import argparse
+import os
+import numpy as np
+import pandas as pd
+import yaml
+import csv_utils as csvr
+from compute_results import ResultsComputer
+from error_stats import ErrorStats
+from experiment_frame import ExperimentFrame
+from get_results_from_csv import THRUST_SENDED, THRUST_MEASURED, VOLTAGE, THROTTLE
+from config_utils import csv_options, tm_parameters_list
+from polynomial_fit import scaling_matrix
+
+
+def flight_sums(z: np.ndarray, gamma: np.ndarray, flights: np.ndarray, n_flights: int,
+                max_degree: int) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Sums of each flight needed to fit a polynomial γ(z) by least squares on any set of flights
+
+    :param z: Scaled voltage of each sample
+    :param gamma: Correction factor of each sample
+    :param flights: Index of the flight of each sample
+    :param n_flights: Number of flights
+    :param max_degree: Maximum degree of the polynomials fitted
+    :return: (Σ z^k for k up to 2 max_degree, Σ γ z^k for k up to max_degree, Σ γ², samples),
+        with a row per flight
+    """
+    powers = z[:, None] ** np.arange(2 * max_degree + 1)
+    z_moments = np.stack([np.bincount(flights, powers[:, k], n_flights)
+                          for k in range(2 * max_degree + 1)], axis=1)
+    gamma_moments = np.stack([np.bincount(flights, gamma * powers[:, k], n_flights)
+                              for k in range(max_degree + 1)], axis=1)
+    gamma_squares = np.bincount(flights, gamma ** 2, n_flights)
+    counts = np.bincount(flights, minlength=n_flights).astype(np.float64)
+    return z_moments, gamma_moments, gamma_squares, counts
+
+
+def gram_matrices(z_moments: np.ndarray, degree: int) -> np.ndarray:
+    """
+    Gram matrices Vᵀ V of the Vandermonde matrix of degree, from the sums of the powers of z
+
+    :param z_moments: Σ z^k of each set of samples, in the last axis
+    :param degree: Degree of the polynomial
+    :return: Matrices, with the shape of the sets followed by (degree + 1, degree + 1)
+    """
+    k = np.add.outer(np.arange(degree + 1), np.arange(degree + 1))
+    return z_moments[..., k]
+
+
+def solve(gram: np.ndarray, rhs: np.ndarray) -> np.ndarray:
+    """
+    Solve a stack of normal equations, with the pseudo-inverse for the singular ones
+
+    :param gram: Gram matrices (..., n, n)
+    :param rhs: Right hand sides (..., n)
+    :return: Coefficients (..., n)
+    """
+    try:
+        return np.linalg.solve(gram, rhs[..., None])[..., 0]
+    except np.linalg.LinAlgError:
+        return (np.linalg.pinv(gram) @ rhs[..., None])[..., 0]
+
+
+def squared_errors(coefficients: np.ndarray, gram: np.ndarray, gamma_moments: np.ndarray,
+                   gamma_squares: np.ndarray) -> np.ndarray:
+    """
+    Sum of squared residuals of polynomials on sets of samples, from the sums of the sets:
+    cᵀ G c - 2 cᵀ b + Σ γ²
+    """
+    return (np.einsum('...i,...ij,...j->...', coefficients, gram, coefficients)
+            - 2 * np.einsum('...i,...i->...', coefficients, gamma_moments) + gamma_squares)
+
+
+def select_degrees(z_moments: np.ndarray, gamma_moments: np.ndarray, gamma_squares: np.ndarray,
+                   counts: np.ndarray, degrees: list[int]) -> np.ndarray:
+    """
+    Degree of the correction factor of each fold, chosen with an inner leave-one-flight-out on
+    the rest of the flights: the degree with the lowest mean squared error on the flights left
+    out of the inner fits.
+
+    :return: Degree of each fold
+    """
+    n_flights = len(counts)
+    others = ~np.eye(n_flights, dtype=bool)
+    scores = []
+    for degree in degrees:
+        n = degree + 1
+        gram = gram_matrices(z_moments, degree)
+        rhs = gamma_moments[:, :n]
+        # Fit without the outer flight f and the inner flight g, scored on g
+        inner_gram = gram.sum(axis=0) - gram[:, None] - gram[None, :]
+        inner_rhs = rhs.sum(axis=0) - rhs[:, None] - rhs[None, :]
+        # f == g is not scored, but keep its system regular
+        inner_gram[np.arange(n_flights), np.arange(n_flights)] += gram
+        inner_rhs[np.arange(n_flights), np.arange(n_flights)] += rhs
+        coefficients = solve(inner_gram, inner_rhs)
+        sse = squared_errors(coefficients, gram[None, :], rhs[None, :], gamma_squares[None, :])
+        samples = np.where(others, counts[None, :], 0).sum(axis=1)
+        scores.append(np.where(others, sse, 0).sum(axis=1) / np.maximum(samples, 1))
+    return np.asarray(degrees)[np.argmin(scores, axis=0)]
+
+
+def leave_one_flight_out(voltage: np.ndarray, gamma: np.ndarray, flights: np.ndarray,
+                         degrees: list[int]) -> tuple[np.ndarray, np.ndarray, np.ndarray, float, float]:
+    """
+    Fit γ(B) once per flight, with the samples of all the other flights.
+
+    The voltage is centered and scaled for all the folds, so the normal equations of every fold
+    come from per-flight sums computed once, and all the folds are solved together.
+
+    :param voltage: Battery voltage of each sample
+    :param gamma: Correction factor of each sample
+    :param flights: Index of the flight of each sample, from 0
+    :param degrees: Degrees of the polynomial. With several, each fold takes the best one in
+        an inner leave-one-flight-out.
+    :return: (coefficients of each fold in voltage, lowest degree first and padded with zeros
+        to the maximum degree, degree of each fold, coefficients of each fold in the scaled
+        voltage z = (voltage - offset) / scale, offset, scale)
+    """
+    n_flights = int(flights.max()) + 1
+    if n_flights < 2:
+        raise ValueError("At least two flights are needed for a leave-one-flight-out validation")
+    valid = np.isfinite(voltage) & np.isfinite(gamma)
+    offset = voltage[valid].mean()
+    scale = voltage[valid].std() or 1.0
+    z = (voltage - offset) / scale
+    max_degree = max(degrees)
+    z_moments, gamma_moments, gamma_squares, counts = flight_sums(
+        z[valid], gamma[valid], flights[valid], n_flights, max_degree)
+
+    if len(degrees) > 1:
+        fold_degrees = select_degrees(z_moments, gamma_moments, gamma_squares, counts, degrees)
+    else:
+        fold_degrees = np.full(n_flights, degrees[0])
+
+    coefficients_z = np.zeros((n_flights, max_degree + 1))
+    for degree in np.unique(fold_degrees):
+        folds = fold_degrees == degree
+        gram = gram_matrices(z_moments, degree)
+        rhs = gamma_moments[:, :degree + 1]
+        coefficients_z[folds, :degree + 1] = solve(gram.sum(axis=0) - gram[folds], rhs.sum(axis=0) - rhs[folds])
+    coefficients = coefficients_z @ scaling_matrix(max_degree, offset, scale).T
+    return coefficients, fold_degrees, coefficients_z, offset, scale
+
+
+def cross_validate(data: ExperimentFrame, flights: np.ndarray, tm_parameters: list[float],
+                   degrees: list[int] = (2,)) -> tuple[pd.DataFrame, ErrorStats, ErrorStats]:
+    """
+    Leave-one-flight-out validation of the correction factor. For each flight, γ(B) is fitted
+    with the other flights, and the throttle and thrust errors are computed on the flight left
+    out, as in GetResultsFromCSV.thrustmap_with_correction_factor and computed_thrust_expected.
+
+    :param data: Columns of the unified experiments
+    :param flights: Flight of each sample
+    :param tm_parameters: Parameters of the thrust map
+    :param degrees: Degrees of the correction factor to choose from
+    :return: (table with a row per fold, throttle error of all the folds, thrust error of all
+        the folds)
+    """
+    compute = ResultsComputer()
+    names, flight_index = np.unique(flights, return_inverse=True)
+    voltage = data[VOLTAGE]
+    thrust_sended = data[THRUST_SENDED]
+    thrust_measured = data[THRUST_MEASURED]
+    gamma = compute.correction_factor_array(thrust_sended, thrust_measured)
+    coefficients, fold_degrees, coefficients_z, offset, scale = leave_one_flight_out(
+        voltage, gamma, flight_index, list(degrees))
+
+    # γ(B) of each sample, with the fit of the fold that left its flight out
+    z = (voltage - offset) / scale
+    gamma_fold = np.sum(coefficients_z[flight_index] * z[:, None] ** np.arange(coefficients_z.shape[1]), axis=1)
+    throttle = compute.compute_throttle_array(thrust_measured * gamma_fold, voltage, None, False, tm_parameters)
+    thrust_expected = thrust_sended / gamma_fold
+    # Errors as in ResultsComputer.compute_error_array
+    throttle_error = np.abs(throttle - data[THROTTLE]) / 10
+    thrust_error = np.abs(thrust_expected - thrust_measured) / 10
+
+    order = np.argsort(flight_index, kind='stable')
+    bounds = np.cumsum(np.bincount(flight_index, minlength=len(names)))[:-1]
+    rows = []
+    for i, (name, fold_throttle, fold_thrust) in enumerate(zip(
+            names, np.split(throttle_error[order], bounds), np.split(thrust_error[order], bounds))):
+        throttle_stats = ErrorStats.from_errors(fold_throttle)
+        thrust_stats = ErrorStats.from_errors(fold_thrust)
+        row = {'flight': name, 'samples': len(fold_throttle), 'degree': int(fold_degrees[i])}
+        # Named by the power of the voltage, cf_c0 is the constant term
+        row.update({f'cf_c{k}': value for k, value in enumerate(coefficients[i])})
+        for prefix, stats in (('throttle_error', throttle_stats), ('thrust_error', thrust_stats)):
+            row.update({f'{prefix}_mean': stats.mean, f'{prefix}_std': stats.std,
+                        f'{prefix}_rmse': stats.rmse, f'{prefix}_p95': stats.percentiles.get(95)})
+        rows.append(row)
+    return pd.DataFrame(rows), ErrorStats.from_errors(throttle_error), ErrorStats.from_errors(thrust_error)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--config',
+                        type=str,
+                        default='correction_factor/config/config_default.yaml',
+                        help="Config file path")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.config):
+        raise FileNotFoundError(f"Config file does not exist: {args.config}")
+    with open(args.config, 'r') as file:
+        config = yaml.safe_load(file)
+    folder = config.get("folder_experiment")
+    cv_config = config.get("cross_validation") or {}
+    degrees = cv_config.get("degrees", [2])
+
+    csv = csvr.CSVResults(**csv_options(config))
+    csv.unify_csvs(f"data/{folder}", "data/results", f"{folder}.csv")
+    data = ExperimentFrame.read(csv, f"data/results/{folder}.csv",
+                                [THRUST_SENDED, THRUST_MEASURED, VOLTAGE, THROTTLE, csvr.SOURCE_COLUMN])
+    folds, throttle_stats, thrust_stats = cross_validate(
+        data, data[csvr.SOURCE_COLUMN], tm_parameters_list(config.get("tm_parameters", {})), degrees)
+
+    output_file = Path(cv_config.get("output_dir", "data/cross_validation")) / f"{folder}_lofo.csv"
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    folds.to_csv(output_file, index=False)
+    print(folds.to_string(index=False))
+    print(f"Out-of-sample throttle error : {throttle_stats}")
+    print(f"Out-of-sample thrust error : {thrust_stats}")
+    print(f"Folds saved in {output_file}")
+
+
+if __name__ == "__main__":
+    main()
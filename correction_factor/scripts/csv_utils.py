@@ -35,8 +35,31 @@ __license__ = 'BSD-3-Clause'
 from std_msgs.msg import Header
 from pathlib import Path
 import pandas as pd
+import numpy as np
+import bz2
 import csv
-from collections import defaultdict
+import gzip
+import hashlib
+import lzma
+from collections import OrderedDict
+import io
+import json
+import os
+import tempfile
+
+# Cells read as NaN
+NAN_VALUES = ['', 'nan', 'NaN', 'NAN']
+# Column of the unified CSVs with the file each row comes from
+SOURCE_COLUMN = 'Flight'
+# File suffix of each storage format of the results
+STORAGE_SUFFIXES = {'csv': '.csv', 'parquet': '.parquet', 'feather': '.feather'}
+# Suffix added to the compressed CSVs, and module to open them
+CSV_COMPRESSIONS = {'gzip': ('.gz', gzip), 'bz2': ('.bz2', bz2), 'xz': ('.xz', lzma)}
+# Suffixes of the results files, the compressed CSVs first so they are matched before '.csv'
+RESULT_SUFFIXES = ([STORAGE_SUFFIXES['csv'] + suffix for suffix, _ in CSV_COMPRESSIONS.values()]
+                   + list(STORAGE_SUFFIXES.values()))
+# Rows formatted at a time when writing a CSV
+CSV_CHUNK_ROWS = 100_000
 
 
 def timestamp_to_float(header: Header) -> float:
@@ -44,9 +67,355 @@ def timestamp_to_float(header: Header) -> float:
     return header.stamp.sec + header.stamp.nanosec * 1e-9
 
 
+def result_suffix(path: Path) -> str:
+    """Suffix of a results file, with the compression of CSVs, or '' if it is not a results file"""
+    for suffix in RESULT_SUFFIXES:
+        if path.name.endswith(suffix):
+            return suffix
+    return ''
+
+
+def result_stem(path: Path) -> str:
+    """Name of a results file without its suffix"""
+    return path.name[:len(path.name) - len(result_suffix(path))]
+
+
+def with_result_suffix(path: Path, suffix: str) -> Path:
+    """Path with the suffix of the results file replaced"""
+    return path.with_name(result_stem(path) + suffix)
+
+
+def open_csv(filename: Path, mode: str, **kwargs):
+    """Open a CSV, uncompressing it if its suffix is the one of a compression"""
+    for compression_suffix, module in CSV_COMPRESSIONS.values():
+        if filename.name.endswith(compression_suffix):
+            return module.open(filename, mode, **kwargs)
+    return open(filename, mode, **kwargs)
+
+
+def write_csv(columns: dict[str, np.ndarray], filename: Path, float_precision: int = None):
+    """
+    Write columns to a CSV, compressed if its suffix is the one of a compression. The values
+    are formatted and written in chunks of rows, without building a tuple per row.
+
+    :param columns: Dictionary with the values of each column, all of the same length
+    :param filename: File to write
+    :param float_precision: Significant digits of the values. If None, the shortest
+        representation that reads back to the same float.
+    """
+    to_text = repr if float_precision is None else f'%.{float_precision}g'.__mod__
+    values = [np.asarray(column, dtype=np.float64) for column in columns.values()]
+    n_rows = min((len(column) for column in values), default=0)
+    with open_csv(filename, mode='wb') as file:
+        file.write(csv_line(list(columns)))
+        for start in range(0, n_rows, CSV_CHUNK_ROWS):
+            texts = [map(to_text, column[start:start + CSV_CHUNK_ROWS].tolist()) for column in values]
+            file.write(('\n'.join(map(','.join, zip(*texts))) + '\n').encode())
+
+
+def read_header(filename: Path) -> list[str]:
+    """Column names of a results file"""
+    if filename.suffix == '.parquet':
+        import pyarrow.parquet as pq
+        return pq.read_schema(filename).names
+    if filename.suffix == '.feather':
+        import pyarrow as pa
+        with pa.memory_map(str(filename)) as source:
+            return pa.ipc.open_file(source).schema.names
+    with open_csv(filename, mode='rt', newline='') as file:
+        return next(csv.reader(file), [])
+
+
+def resolve_file(filename: str) -> Path:
+    """
+    Path of a results file. If it does not exist, the file with the same name in another
+    storage format is used, so results can be read without knowing their format.
+    """
+    path = Path(filename)
+    if not path.exists():
+        for suffix in RESULT_SUFFIXES:
+            if with_result_suffix(path, suffix).exists():
+                return with_result_suffix(path, suffix)
+    return path
+
+
+def read_table(filename: Path, columns: list[str] = None):
+    """
+    Read a parquet or feather file as a pyarrow Table, memory mapped
+
+    :param filename: Parquet or feather file
+    :param columns: Names of the columns to read. If None, all of them.
+    :return: Table with the columns
+    """
+    missing = [key for key in columns or [] if key not in read_header(filename)]
+    if missing:
+        raise ValueError(f"Columns not found: {missing}")
+    if filename.suffix == '.parquet':
+        import pyarrow.parquet as pq
+        return pq.read_table(filename, columns=columns, memory_map=True)
+    import pyarrow.feather as feather
+    return feather.read_table(filename, columns=columns, memory_map=True)
+
+
+def write_table(columns: dict, filename: Path, storage_format: str):
+    """
+    Write columns to a parquet or feather file
+
+    :param columns: Dictionary with the values of each column
+    :param filename: File to write
+    :param storage_format: 'parquet' or 'feather'
+    """
+    import pyarrow as pa
+    table = pa.table(columns)
+    if storage_format == 'parquet':
+        import pyarrow.parquet as pq
+        pq.write_table(table, filename, compression='zstd')
+    else:
+        import pyarrow.feather as feather
+        # Uncompressed, so the columns can be read straight from the memory map
+        feather.write_feather(table, filename, compression='uncompressed')
+
+
+def write_unified_table(files: list[Path], filename: Path, storage_format: str, source_column: str):
+    """
+    Write the rows of several parquet or feather files to one file, reading one file at a
+    time, with the name of the file each row comes from as last column
+
+    :param files: Files to unify
+    :param filename: File to write
+    :param storage_format: 'parquet' or 'feather'
+    :param source_column: Name of the column with the file of each row
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    writer = None
+    try:
+        for file in files:
+            table = read_table(file)
+            table = table.append_column(source_column, pa.array([result_stem(file)] * table.num_rows, type=pa.string()))
+            if writer is None:
+                if storage_format == 'parquet':
+                    writer = pq.ParquetWriter(filename, table.schema, compression='zstd')
+                else:
+                    writer = pa.ipc.new_file(str(filename), table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def column_array(key: str, column: pd.Series) -> np.ndarray:
+    """
+    Values of a column read from a results file: float64, except for the source column
+
+    :param key: Name of the column
+    :param column: Values read
+    :return: Values as an array
+    """
+    if key == SOURCE_COLUMN:
+        return column.astype(str).to_numpy()
+    if column.dtype != np.float64:
+        values = pd.to_numeric(column, errors='coerce')
+        for value in column[values.isna() & column.notna()]:
+            print(f"WARNING: Could not convert '{value}' to float in column '{key}'")
+        column = values
+    return column.to_numpy(dtype=np.float64)
+
+
+def ragged_rows(content: bytes) -> np.ndarray:
+    """
+    Line numbers (from 1, the header included) of the rows of a CSV that do not have as
+    many cells as the header, the first line that is not blank. Blank lines are skipped,
+    as pandas does.
+
+    :param content: Content of the CSV
+    :return: Line numbers of the ragged rows
+    """
+    if not content:
+        return np.empty(0, dtype=np.intp)
+    if b'"' in content:
+        # Quoted cells may contain commas, count the cells with the csv module
+        lines = io.StringIO(content.decode(), newline='')
+        counts = np.array([len(row) for row in csv.reader(lines)])
+        blank = counts == 0
+    else:
+        buffer = np.frombuffer(content, dtype=np.uint8)
+        ends = np.flatnonzero(buffer == ord('\n'))
+        if buffer[-1] != ord('\n'):
+            ends = np.append(ends, len(buffer))
+        starts = np.concatenate(([0], ends[:-1] + 1))
+        # Cells = commas + 1, counted per line from the sorted positions of the commas
+        counts = np.diff(np.searchsorted(np.flatnonzero(buffer == ord(',')), np.append(0, ends))) + 1
+        length = ends - starts - (buffer[np.maximum(ends - 1, 0)] == ord('\r'))
+        blank = length <= 0
+    header = counts[np.argmax(~blank)]
+    return np.flatnonzero((counts != header) & ~blank) + 1
+
+
+def csv_line(fields: list[str]) -> bytes:
+    """Encode a row of a CSV"""
+    line = io.StringIO()
+    csv.writer(line, lineterminator='\n').writerow(fields)
+    return line.getvalue().encode()
+
+
+def copy_rows(filename: Path, out, source: str):
+    """
+    Append the rows of a CSV, without its header, to an open binary file, with the source as
+    last column
+
+    :param filename: CSV to copy
+    :param out: Binary file where the rows are written
+    :param source: Value of the source column
+    """
+    tag = b',' + csv_line([source]).rstrip(b'\n') + b'\n'
+    with open_csv(filename, mode='rb') as file:
+        next(file, None)
+        for line in file:
+            line = line.rstrip(b'\r\n')
+            if line:
+                out.write(line + tag)
+
+
+def file_hash(filename: Path) -> str:
+    """SHA-256 of the content of a file"""
+    digest = hashlib.sha256()
+    with open(filename, mode='rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_manifest(filename: Path) -> dict:
+    """Manifest of a unified CSV, empty if it does not exist or can not be read"""
+    try:
+        with open(filename, mode='r') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_manifest(filename: Path, manifest: dict):
+    """Write the manifest of a unified CSV"""
+    with open(filename, mode='w') as file:
+        json.dump(manifest, file, indent=2)
+
+
+class ParsedFileCache:
+    """
+    Cache of the columns read from results files, shared by every CSVResults in the process.
+
+    The entries are keyed by path and checked against the modification time and size of the
+    file, so a file saved again is parsed again. The least recently used files are removed
+    above the maximum size. The arrays are read-only, since they are shared.
+    """
+
+    def __init__(self, max_size_mb: float = 256):
+        """
+        :param max_size_mb: Maximum size of the arrays kept, in MB
+        """
+        self.max_size = int(max_size_mb * 1024 * 1024)
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        # Path -> ((mtime, size) of the file, columns read, whether all columns were read)
+        self.entries = OrderedDict()
+
+    @staticmethod
+    def file_stamp(path: Path) -> tuple[int, int]:
+        stat = path.stat()
+        return stat.st_mtime_ns, stat.st_size
+
+    def get(self, path: Path, columns: list[str] = None) -> dict[str, np.ndarray]:
+        """
+        Columns of a file, if they are cached and the file has not changed
+
+        :param path: Results file
+        :param columns: Names of the columns. If None, all of them.
+        :return: Dictionary with the values of each column, or None if they are not cached
+        """
+        key = str(path.resolve())
+        entry = self.entries.get(key)
+        if entry is not None:
+            stamp, data, complete = entry
+            if stamp != self.file_stamp(path):
+                self.remove(key)
+            elif columns is None and complete:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return dict(data)
+            elif columns is not None and all(column in data for column in columns):
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return {column: data[column] for column in columns}
+        self.misses += 1
+        return None
+
+    def put(self, path: Path, data: dict[str, np.ndarray], complete: bool):
+        """
+        Add the columns read from a file
+
+        :param path: Results file
+        :param data: Dictionary with the values of each column. The arrays are made read-only.
+        :param complete: Whether data has all the columns of the file
+        """
+        key = str(path.resolve())
+        stamp = self.file_stamp(path)
+        for values in data.values():
+            values.flags.writeable = False
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] == stamp:
+            data = {**entry[1], **data}
+            complete = complete or entry[2]
+        self.remove(key)
+        size = sum(values.nbytes for values in data.values())
+        if size > self.max_size:
+            return
+        self.entries[key] = (stamp, data, complete)
+        self.size += size
+        while self.size > self.max_size:
+            self.remove(next(iter(self.entries)))
+
+    def remove(self, key: str):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= sum(values.nbytes for values in entry[1].values())
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
+
+
+# Cache used by default by all CSVResults
+PARSED_FILES = ParsedFileCache()
+
+
 class CSVResults:
-    def __init__(self):
-        pass
+    def __init__(self, storage_format: str = 'csv', file_cache: ParsedFileCache = PARSED_FILES,
+                 float_precision: int = None, compression: str = None):
+        """
+        :param storage_format: Format of the results saved: 'csv', 'parquet' or 'feather'.
+            Parquet and feather need pyarrow.
+        :param file_cache: Cache of the files read. If None, the files are parsed every time.
+        :param float_precision: Significant digits of the values saved to CSVs. If None, all.
+        :param compression: Compression of the CSVs saved: 'gzip', 'bz2', 'xz' or None
+        """
+        if storage_format not in STORAGE_SUFFIXES:
+            raise ValueError(f"Unknown storage format '{storage_format}', it must be one of {list(STORAGE_SUFFIXES)}")
+        if compression is not None and compression not in CSV_COMPRESSIONS:
+            raise ValueError(f"Unknown compression '{compression}', it must be one of {list(CSV_COMPRESSIONS)}")
+        self.storage_format = storage_format
+        self.float_precision = float_precision
+        self.compression = compression
+        self.csv_suffix = STORAGE_SUFFIXES['csv'] + (CSV_COMPRESSIONS[compression][0] if compression else '')
+        self.suffix = self.csv_suffix if storage_format == 'csv' else STORAGE_SUFFIXES[storage_format]
+        self.file_cache = file_cache
+
+    @property
+    def options(self) -> dict:
+        """Options to build an equivalent CSVResults, e.g. in another process"""
+        return {'storage_format': self.storage_format, 'float_precision': self.float_precision,
+                'compression': self.compression}
 
     def save_data_to_csv(self,
                          data_list: list[list[tuple]],
@@ -55,86 +424,153 @@ class CSVResults:
                          output_dir: str
                          ):
         """
-        Save data
+        Save data, each series of rows to a CSV
 
         """
         out_path = Path(output_dir)
         out_path.mkdir(exist_ok=True)
 
         for series, col_names, filename in zip(data_list, column_names_list, filenames):
-            file_path = out_path / filename
-
-            with open(file_path, mode='w', newline='') as file:
-                writer = csv.writer(file)
-                writer.writerow(col_names)
-
-                for row in series:
-                    writer.writerow(row)
+            file_path = with_result_suffix(out_path / filename, self.csv_suffix)
+            rows = np.asarray(series, dtype=np.float64).reshape(-1, len(col_names))
+            write_csv(dict(zip(col_names, rows.T)), file_path, self.float_precision)
 
     def save_data(self, columns: list[list], column_names: list[str], filename: str, output_dir: str):
+        """
+        Save columns to a results file in the storage format. The suffix of the filename is
+        replaced by the one of the format. The columns are cut to the length of the shortest.
+        """
         out_path = Path(output_dir)
         out_path.mkdir(parents=True, exist_ok=True)
 
-        file_path = out_path / filename
-        rows = list(zip(*columns))
-
-        with open(file_path, mode='w', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerow(column_names)
-            writer.writerows(rows)
+        file_path = with_result_suffix(out_path / filename, self.suffix)
+        n = min(len(column) for column in columns)
+        values = {name: np.asarray(column[:n], dtype=np.float64) for name, column in zip(column_names, columns)}
+        if self.storage_format == 'csv':
+            write_csv(values, file_path, self.float_precision)
+        else:
+            write_table(values, file_path, self.storage_format)
 
-    def unify_csvs(self, input_dir: str, output_dir: str, filename: str):
+    def unify_csvs(self, input_dir: str, output_dir: str, filename: str,
+                   source_column: str = SOURCE_COLUMN):
         """
-        Unify the CSVs of the same type of experiments into one file.
+        Unify the results files of the same type of experiments into one file, in the storage
+        format. The suffix of the filename is replaced by the one of the format.
+
+        The files are copied one by one, line by line for CSVs, so they are never all loaded in
+        memory, and each row is tagged with the name of its file in the source column. A
+        manifest next to the output keeps the hash of each file unified: if the files already
+        unified have not changed, only the new ones are appended to a CSV output, and nothing
+        is done if there are no new files.
+
+        :param input_dir: Folder with the results files of the experiments
+        :param output_dir: Folder of the unified file
+        :param filename: Name of the unified file
+        :param source_column: Name of the column with the file of each row
+        :raises ValueError: If the files do not have the same columns
         """
         input_path = Path(input_dir)
-        csv_files = list(input_path.glob("*.csv"))
+        csv_files = sorted(input_path.glob(f"*{self.suffix}"))
 
         if not csv_files:
-            print(f"[ERROR] No .csv files were found in '{input_dir}'")
+            print(f"[ERROR] No {self.suffix} files were found in '{input_dir}'")
             return
 
-        # Crear el directorio de salida si no existe
+        header = read_header(csv_files[0])
+        for csv_file in csv_files[1:]:
+            if read_header(csv_file) != header:
+                # The unified file from a previous run would be read as if it were up to date
+                raise ValueError(f"The columns of '{csv_file}' are different from the ones of '{csv_files[0]}'")
+
         out_path = Path(output_dir)
         out_path.mkdir(parents=True, exist_ok=True)
+        output_file = with_result_suffix(out_path / filename, self.suffix)
+        manifest_file = with_result_suffix(output_file, '.manifest.json')
 
-        # Ruta completa del archivo de salida
-        output_file = out_path / filename
+        hashes = {csv_file.name: file_hash(csv_file) for csv_file in csv_files}
+        manifest = read_manifest(manifest_file)
+        unified = manifest.get('files', {})
+        unchanged = (output_file.exists()
+                     and manifest.get('header') == header + [source_column]
+                     and manifest.get('size') == output_file.stat().st_size
+                     and all(hashes.get(name) == digest for name, digest in unified.items()))
+        new_files = [f for f in csv_files if f.name not in unified] if unchanged else csv_files
 
-        # Leer y unir los CSVs
-        dfs = [pd.read_csv(f) for f in csv_files]
-        df_all = pd.concat(dfs, ignore_index=True)
-        df_all.to_csv(output_file, index=False)
+        if unchanged and not new_files:
+            print(f"{output_file} is up to date")
+            return
 
-        print(f"Unify {len(csv_files)} files in {output_file}")
+        if unchanged and self.storage_format == 'csv':
+            with open_csv(output_file, mode='ab') as out:
+                for csv_file in new_files:
+                    copy_rows(csv_file, out, result_stem(csv_file))
+        else:
+            # Write to a temporary file first, so the old output stays valid until the new one is complete
+            new_files = csv_files
+            unified = {}
+            with tempfile.NamedTemporaryFile(dir=out_path, suffix='.tmp' + self.suffix, delete=False) as out:
+                temp_file = Path(out.name)
+            if self.storage_format == 'csv':
+                with open_csv(temp_file, mode='wb') as out:
+                    out.write(csv_line(header + [source_column]))
+                    for csv_file in new_files:
+                        copy_rows(csv_file, out, result_stem(csv_file))
+            else:
+                write_unified_table(new_files, temp_file, self.storage_format, source_column)
+            os.replace(temp_file, output_file)
 
-    def read_csv(self, filename: str):
-        data = defaultdict(list)
+        unified.update({f.name: hashes[f.name] for f in new_files})
+        write_manifest(manifest_file, {'header': header + [source_column],
+                                       'size': output_file.stat().st_size,
+                                       'files': unified})
+        print(f"Unify {len(new_files)} files in {output_file}")
 
-        with open(filename, mode='r', newline='') as file:
-            csv_reader = csv.DictReader(file)
+    def read_csv(self, filename: str, columns: list[str] = None) -> dict[str, np.ndarray]:
+        """
+        Read the columns of a results file as float64 arrays. The source column of the unified
+        files is read as strings.
 
-            for row in csv_reader:
-                for key, value in row.items():
-                    if value.strip() == '':
-                        continue  # Ignora celdas vacías
-                    try:
-                        data[key].append(float(value))
-                    except ValueError:
-                        print(
-                            f"WARNING: Could not convert '{value}' to float in column '{key}'"
-                        )
-                        data[key].append(None)
-        ref_key = list(data.keys())[0]
-        ref_len = len(data[ref_key])
+        The file can be a CSV, parquet or feather file. If it does not exist, the file with
+        the same name in another format is read. Parquet and feather files are memory mapped.
+        The columns are kept in the file cache, so the arrays returned are read-only.
 
-        for key in data.keys():
-            if len(data[key]) != ref_len:
-                print(
-                    f"ERROR: The key '{key}' has a different length ({len(data[key])}) compared to '{ref_key}' ({ref_len})")
+        Empty cells and 'nan' are read as NaN. Cells that are not numbers are read as NaN too,
+        with a warning. Rows with fewer or more cells than the header are an error instead of
+        being filled with NaN.
 
-                return None
+        :param filename: Results file
+        :param columns: Names of the columns to read. If None, all of them.
+        :return: Dictionary with the values of each column, or None if the file can not be read
+        """
+        path = resolve_file(filename)
+        if self.file_cache is not None:
+            data = self.file_cache.get(path, columns)
+            if data is not None:
+                return data
+
+        try:
+            if path.suffix in ('.parquet', '.feather'):
+                table = read_table(path, columns)
+                df = {key: table.column(key).to_pandas() for key in table.column_names}
+                keys = table.column_names
+            else:
+                with open_csv(path, mode='rb') as file:
+                    content = file.read()
+                ragged = ragged_rows(content)
+                if len(ragged):
+                    raise ValueError(f'{len(ragged)} rows do not have as many cells as the header, '
+                                     f'the first one in line {ragged[0]}')
+                df = pd.read_csv(io.BytesIO(content), usecols=columns, engine='c', na_values=NAN_VALUES,
+                                 keep_default_na=False, skipinitialspace=True, on_bad_lines='error')
+                keys = df.columns
+        except ValueError as e:
+            # Columns not found or rows with fewer or more cells than the header
+            print(f"ERROR: Could not read '{filename}': {e}")
+            return None
 
+        data = {key: column_array(key, df[key]) for key in (columns if columns is not None else keys)}
+        if self.file_cache is not None:
+            self.file_cache.put(path, data, complete=columns is None)
         return data
 
     def get_vector_from_csv(self, data1, data2) -> list[tuple[float, float]]:
@@ -146,5 +582,15 @@ class CSVResults:
     from pathlib import Path
 
     def files_in_folder(self, folder_name):
+        """
+        Results files in a folder. If a result is saved in several formats, only the file in
+        the storage format is listed.
+        """
         path = Path(folder_name)
-        return [str(file) for file in path.iterdir() if file.is_file()]
+        files = {}
+        for file in sorted(path.iterdir()):
+            if not file.is_file() or not result_suffix(file):
+                continue
+            if result_stem(file) not in files or result_suffix(file) == self.suffix:
+                files[result_stem(file)] = file
+        return [str(file) for file in files.values()]
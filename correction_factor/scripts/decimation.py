@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+
+# Copyright 2025 Universidad Politécnica de Madrid
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer in the
+#      documentation and/or other materials provided with the distribution.
+#
+#    * Neither the name of the Universidad Politécnica de Madrid nor the names of its
+#      contributors may be used to endorse or promote products derived from
+#      this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+""" Downsampling of the data plotted that keeps its shape. """
+
+__authors__ = 'Carmen De Rojas Pita-Romero'
+__copyright__ = 'Copyright (c) 2025 Universidad Politécnica de Madrid'
+__license__ = 'BSD-3-Clause'
+
+import numpy as np
+
+
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-triangle-three-buckets: split the samples in buckets and keep, from each bucket,
+    the sample that forms the largest triangle with the sample kept from the previous bucket
+    and the mean of the next one, so peaks and trends are kept.
+
+    :param x: Independent variable, sorted
+    :param y: Dependent variable
+    :param n_out: Number of samples kept
+    :return: Indices of the samples kept, sorted. The first and last samples are always kept.
+    """
+    n = len(x)
+    if n_out >= n:
+        return np.arange(n)
+    if n_out < 3:
+        return np.array([0, n - 1])[:max(n_out, 1)]
+    # n_out - 2 buckets between the first and the last samples
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    edges = np.append(edges, n)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        next_x = x[end:edges[i + 2]].mean()
+        next_y = y[end:edges[i + 2]].mean()
+        area = np.abs((x[a] - next_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (next_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def min_max(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Split the range of x in n_out / 2 buckets of the same width, e.g. the pixels of the plot,
+    and keep the samples with the minimum and maximum y of each bucket.
+
+    :param x: Independent variable, in any order
+    :param y: Dependent variable
+    :param n_out: Maximum number of samples kept
+    :return: Indices of the samples kept, sorted
+    """
+    n_buckets = max(n_out // 2, 1)
+    span = x.max() - x.min()
+    if span > 0:
+        bucket = np.minimum(((x - x.min()) / span * n_buckets).astype(np.int64), n_buckets - 1)
+    else:
+        bucket = np.zeros(len(x), dtype=np.int64)
+    lowest = np.full(n_buckets, np.inf)
+    highest = np.full(n_buckets, -np.inf)
+    np.minimum.at(lowest, bucket, y)
+    np.maximum.at(highest, bucket, y)
+    # First sample of each bucket at its minimum and at its maximum
+    candidates = np.flatnonzero((y == lowest[bucket]) | (y == highest[bucket]))
+    is_min = y[candidates] == lowest[bucket[candidates]]
+    is_max = y[candidates] == highest[bucket[candidates]]
+    _, first_min = np.unique(bucket[candidates[is_min]], return_index=True)
+    _, first_max = np.unique(bucket[candidates[is_max]], return_index=True)
+    return np.unique(np.concatenate([candidates[is_min][first_min], candidates[is_max][first_max]]))
+
+
+# Downsampling methods: name -> function(x, y, n_out) that returns the indices kept
+DECIMATION_METHODS = {
+    'lttb': lttb,
+    'minmax': min_max,
+}
+
+
+def decimate(x, y, max_points: int = None, method: str = 'lttb') -> tuple[np.ndarray, np.ndarray]:
+    """
+    Downsample a series to plot it, keeping its shape
+
+    :param x: Independent variable
+    :param y: Dependent variable
+    :param max_points: Maximum number of samples kept. If None, all of them.
+    :param method: 'lttb' or 'minmax'. With 'lttb', the samples are sorted by x first.
+    :return: (x, y) of the samples kept. Samples that are not finite are dropped when the
+        series is downsampled.
+    """
+    if method not in DECIMATION_METHODS:
+        raise ValueError(f"Unknown decimation method '{method}', it must be one of {list(DECIMATION_METHODS)}")
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if not max_points or len(x) <= max_points:
+        return x, y
+    finite = np.isfinite(x) & np.isfinite(y)
+    x, y = x[finite], y[finite]
+    if len(x) <= max_points:
+        return x, y
+    if method == 'lttb' and np.any(np.diff(x) < 0):
+        order = np.argsort(x, kind='stable')
+        x, y = x[order], y[order]
+    index = DECIMATION_METHODS[method](x, y, max_points)
+    return x[index], y[index]
@@ -35,6 +35,235 @@ __copyright__ = 'Copyright (c) 2025 Universidad Politécnica de Madrid'
 __license__ = 'BSD-3-Clause'
 
 import numpy as np
+from numpy.polynomial.polynomial import polyval
+from polynomial_fit import scaling_matrix
+
+
+class CorrectionFactorRLS():
+    """
+    Online estimation of the correction factor polynomial γ(B) with recursive least squares.
+    """
+
+    def __init__(self, degree: int = 2, forgetting_factor: np.float64 = 1.0,
+                 initial_covariance: np.float64 = 1e6, voltage_offset: np.float64 = None,
+                 voltage_scale: np.float64 = 1.0):
+        """
+        Initialize the estimator.
+
+        :param degree (int): Degree of the polynomial.
+        :param forgetting_factor (np.float64): Weight of the previous samples on each update,
+        between 0 and 1. With 1 all samples weight the same.
+        :param initial_covariance (np.float64): Initial covariance of the coefficients, large
+        when nothing is known about them.
+        :param voltage_offset (np.float64): Offset subtracted to the voltage, e.g. the
+        nominal battery voltage, to keep the problem well conditioned. If None, the voltage
+        of the first sample.
+        :param voltage_scale (np.float64): Scale that divides the voltage after the offset.
+        """
+        self.degree_ = degree
+        self.forgetting_factor_ = forgetting_factor
+        self.voltage_offset_ = voltage_offset
+        self.voltage_scale_ = voltage_scale
+        self.theta_ = np.zeros(degree + 1)  # coefficients of the offset and scaled voltage
+        self.P_ = np.eye(degree + 1) * initial_covariance
+        self.scaling_ = scaling_matrix(degree, voltage_offset or 0.0, voltage_scale)
+        self.samples_ = np.float64(0.0)  # effective number of samples
+        self.residual_sum_ = np.float64(0.0)  # weighted sum of squared residuals
+
+    def update(self, voltage: np.float64, correction_factor: np.float64) -> np.ndarray:
+        """
+        Update the coefficients with a new sample, in O(degree²).
+
+        :param voltage (np.float64): The battery voltage.
+        :param correction_factor (np.float64): The correction factor measured at that voltage.
+        :return: The current coefficients, from the lowest degree.
+        """
+        if self.voltage_offset_ is None:
+            # Powers of raw voltages around 22 V make the problem badly conditioned
+            self.voltage_offset_ = np.float64(voltage)
+            self.scaling_ = scaling_matrix(self.degree_, self.voltage_offset_, self.voltage_scale_)
+        z = (voltage - self.voltage_offset_) / self.voltage_scale_
+        phi = z ** np.arange(self.degree_ + 1)
+        P_phi = self.P_ @ phi
+        gain = P_phi / (self.forgetting_factor_ + phi @ P_phi)
+        prior_error = correction_factor - phi @ self.theta_
+        self.theta_ = self.theta_ + gain * prior_error
+        self.P_ = (self.P_ - np.outer(gain, P_phi)) / self.forgetting_factor_
+        self.P_ = (self.P_ + self.P_.T) / 2
+
+        posterior_error = correction_factor - phi @ self.theta_
+        self.residual_sum_ = self.forgetting_factor_ * self.residual_sum_ + prior_error * posterior_error
+        self.samples_ = self.forgetting_factor_ * self.samples_ + 1
+        return self.coefficients
+
+    def update_thrust(self, voltage: np.float64, actuator_thrust: np.float64,
+                      measured_thrust: np.float64) -> np.ndarray:
+        """
+        Update the coefficients with the correction factor of a new sample.
+
+        :param voltage (np.float64): The battery voltage.
+        :param actuator_thrust (np.float64): The actuator thrust.
+        :param measured_thrust (np.float64): The measured thrust.
+        :return: The current coefficients, from the lowest degree.
+        """
+        return self.update(voltage, actuator_thrust / measured_thrust)
+
+    def update_batch(self, voltages: np.ndarray, correction_factors: np.ndarray) -> np.ndarray:
+        """
+        Update the coefficients with several samples, in order.
+
+        :param voltages (np.ndarray): The battery voltages.
+        :param correction_factors (np.ndarray): The correction factors.
+        :return: The current coefficients, from the lowest degree.
+        """
+        for voltage, correction_factor in zip(voltages, correction_factors):
+            self.update(voltage, correction_factor)
+        return self.coefficients
+
+    @property
+    def coefficients(self) -> np.ndarray:
+        """
+        Coefficients of γ(B), from the lowest degree, as the parameters of
+        ResultsComputer.func_*_order.
+        """
+        return self.scaling_ @ self.theta_
+
+    @property
+    def noise_variance(self) -> np.float64:
+        """
+        Estimated variance of the correction factor around the polynomial.
+        """
+        dof = self.samples_ - (self.degree_ + 1)
+        if dof <= 0:
+            return np.float64(np.inf)
+        return self.residual_sum_ / dof
+
+    @property
+    def covariance(self) -> np.ndarray:
+        """
+        Covariance of the coefficients.
+        """
+        return self.noise_variance * (self.scaling_ @ self.P_ @ self.scaling_.T)
+
+    def predict(self, voltage: np.ndarray) -> np.ndarray:
+        """
+        Evaluate γ(B) with the current coefficients.
+
+        :param voltage (np.ndarray): The battery voltage.
+        :return: The correction factor.
+        """
+        return polyval(voltage, self.coefficients)
+
+
+class RunningStatistics():
+    """
+    Mean, variance and RMSE of a stream of values in constant memory, with Welford's
+    algorithm. Optionally, the RMSE of the last values in a fixed size window.
+    """
+
+    def __init__(self, window: int = None):
+        """
+        Initialize the statistics.
+
+        :param window (int): Number of last values used for the windowed RMSE. If None, it is
+        not computed.
+        """
+        self.count_ = 0
+        self.mean_ = np.float64(0.0)
+        self.m2_ = np.float64(0.0)  # sum of squared differences from the mean
+        self.sum_squares_ = np.float64(0.0)
+        self.window_ = window
+        self.buffer_ = np.zeros(window) if window else None
+        self.buffer_index_ = 0
+        self.buffer_count_ = 0
+        self.window_sum_squares_ = np.float64(0.0)
+        self.window_updates_ = 0
+
+    def update(self, value: np.float64):
+        """
+        Add a value, in O(1).
+
+        :param value (np.float64): The new value.
+        """
+        self.count_ += 1
+        delta = value - self.mean_
+        self.mean_ += delta / self.count_
+        self.m2_ += delta * (value - self.mean_)
+        self.sum_squares_ += value * value
+
+        if self.buffer_ is not None:
+            old_value = self.buffer_[self.buffer_index_]
+            self.buffer_[self.buffer_index_] = value
+            self.buffer_index_ = (self.buffer_index_ + 1) % self.window_
+            self.buffer_count_ = min(self.buffer_count_ + 1, self.window_)
+            self.window_updates_ += 1
+            if self.window_updates_ >= self.window_:
+                # Recompute the sum once per window to avoid the drift of the running sum
+                self.window_sum_squares_ = np.sum(np.square(self.buffer_[:self.buffer_count_]))
+                self.window_updates_ = 0
+            else:
+                self.window_sum_squares_ += value * value - old_value * old_value
+
+    def update_batch(self, values: np.ndarray):
+        """
+        Add several values at once, combining their statistics with the current ones.
+
+        :param values (np.ndarray): The new values, in order.
+        """
+        values = np.asarray(values, dtype=np.float64).ravel()
+        if len(values) == 0:
+            return
+        count = len(values)
+        mean = np.mean(values)
+        m2 = np.sum(np.square(values - mean))
+        total = self.count_ + count
+        delta = mean - self.mean_
+        self.mean_ += delta * count / total
+        self.m2_ += m2 + delta * delta * self.count_ * count / total
+        self.count_ = total
+        self.sum_squares_ += np.sum(np.square(values))
+
+        if self.buffer_ is not None:
+            values = values[-self.window_:]
+            indices = (self.buffer_index_ + np.arange(len(values))) % self.window_
+            self.buffer_[indices] = values
+            self.buffer_index_ = (self.buffer_index_ + len(values)) % self.window_
+            self.buffer_count_ = min(self.buffer_count_ + len(values), self.window_)
+            self.window_sum_squares_ = np.sum(np.square(self.buffer_[:self.buffer_count_]))
+            self.window_updates_ = 0
+
+    @property
+    def count(self) -> int:
+        return self.count_
+
+    @property
+    def mean(self) -> np.float64:
+        return self.mean_
+
+    @property
+    def variance(self) -> np.float64:
+        """Population variance, as np.var."""
+        if self.count_ == 0:
+            return np.float64(0.0)
+        return self.m2_ / self.count_
+
+    @property
+    def std(self) -> np.float64:
+        return np.sqrt(self.variance)
+
+    @property
+    def rmse(self) -> np.float64:
+        """Root mean square of all the values."""
+        if self.count_ == 0:
+            return np.float64(0.0)
+        return np.sqrt(self.sum_squares_ / self.count_)
+
+    @property
+    def window_rmse(self) -> np.float64:
+        """Root mean square of the values in the window."""
+        if not self.buffer_count_:
+            return np.float64(0.0)
+        return np.sqrt(max(self.window_sum_squares_, 0.0) / self.buffer_count_)
 
 
 class DisturbanceEstimation():
@@ -42,9 +271,24 @@ class DisturbanceEstimation():
     Disturbance estimation class.
     """
 
-    def __init__(self, real_mass: np.float64):
+    def __init__(self, real_mass: np.float64, correction_factor_degree: int = 2,
+                 forgetting_factor: np.float64 = 1.0, keep_history: bool = False,
+                 rmse_window: int = None, voltage_offset: np.float64 = None,
+                 voltage_scale: np.float64 = 1.0):
         """
         Initialize the disturbance estimation.
+
+        :param real_mass (np.float64): The real mass.
+        :param correction_factor_degree (int): Degree of the correction factor polynomial
+        estimated online.
+        :param forgetting_factor (np.float64): Forgetting factor of the online estimation.
+        :param keep_history (bool): If True, every error is also stored in the history lists.
+        By default only their running statistics are kept, so the memory does not grow with
+        the number of samples.
+        :param rmse_window (int): Number of last errors used for the windowed RMSE.
+        :param voltage_offset (np.float64): Voltage offset of the online estimation, e.g. the
+        nominal battery voltage. If None, the voltage of the first sample.
+        :param voltage_scale (np.float64): Voltage scale of the online estimation.
         """
         self.real_mass_ = real_mass
         self.aceleration_ = np.float64()  # [az]
@@ -58,6 +302,12 @@ class DisturbanceEstimation():
         self.mass_error_history = []
         self.thrust_error_history = []
         self.rmse = np.float64(0.0)
+        self.keep_history = keep_history
+        self.mass_error_stats = RunningStatistics(rmse_window)
+        self.thrust_error_stats = RunningStatistics(rmse_window)
+        self.correction_factor_estimator = CorrectionFactorRLS(
+            correction_factor_degree, forgetting_factor, voltage_offset=voltage_offset,
+            voltage_scale=voltage_scale)
 
     def compute_mass(self, thrust: np.float64, aceleration: np.float64) -> np.float64:
         """
@@ -98,9 +348,25 @@ class DisturbanceEstimation():
         self.real_mass_ = real_mass
         self.estimate_mass_ = estimate_mass
         self.mass_error_ = np.abs(self.estimate_mass_ - self.real_mass_)
-        self.mass_error_history.append(self.mass_error_)
+        if self.keep_history:
+            self.mass_error_history.append(self.mass_error_)
+        self.mass_error_stats.update(self.mass_error_)
         return self.mass_error_
 
+    def compute_mass_error_batch(self, real_mass: np.float64, estimate_mass: np.ndarray) -> np.ndarray:
+        """
+        Compute the error between many computed masses and the real mass.
+        :param real_mass (np.float64): The real mass.
+        :param estimate_mass (np.ndarray): The computed masses.
+        :return: The errors.
+        """
+        self.real_mass_ = real_mass
+        mass_error = np.abs(np.asarray(estimate_mass, dtype=np.float64) - real_mass)
+        if self.keep_history:
+            self.mass_error_history.extend(mass_error.tolist())
+        self.mass_error_stats.update_batch(mass_error)
+        return mass_error
+
     def compute_thrust_error(self, imu_thrust: np.float64, estimate_thrust: np.float64) -> np.float64:
         """
         Compute the error between the computed thrust and the real thrust.
@@ -111,10 +377,26 @@ class DisturbanceEstimation():
         """
         self.actuator_thrust_ = imu_thrust
         self.measured_thrust_ = estimate_thrust
-        self.thrust_error_ = np.abs(self.measured_thrust_ - self.real_thrust_)
-        self.thrust_error_history.append(self.thrust_error_)
+        self.thrust_error_ = np.abs(self.measured_thrust_ - self.actuator_thrust_)
+        if self.keep_history:
+            self.thrust_error_history.append(self.thrust_error_)
+        self.thrust_error_stats.update(self.thrust_error_)
         return self.thrust_error_
 
+    def compute_thrust_error_batch(self, imu_thrust: np.ndarray, estimate_thrust: np.ndarray) -> np.ndarray:
+        """
+        Compute the error between many computed thrusts and the real thrusts.
+        :param imu_thrust (np.ndarray): The real thrusts.
+        :param estimate_thrust (np.ndarray): The computed thrusts.
+        :return: The errors.
+        """
+        thrust_error = np.abs(np.asarray(estimate_thrust, dtype=np.float64) -
+                              np.asarray(imu_thrust, dtype=np.float64))
+        if self.keep_history:
+            self.thrust_error_history.extend(thrust_error.tolist())
+        self.thrust_error_stats.update_batch(thrust_error)
+        return thrust_error
+
     def compute_correction_factor_mass(self, real_mass: np.float64, estimate_mass: np.float64) -> np.float64:
         """
         Compute the correction factor 
@@ -139,12 +421,56 @@ class DisturbanceEstimation():
         self.correction_factor_thrust_ = self.actuator_thrust_ / self.measured_thrust_  # new
         return self.correction_factor_thrust_
 
+    def estimate_correction_factor(self, actuator_thrust: np.float64, measured_thrust: np.float64,
+                                   voltage: np.float64) -> np.ndarray:
+        """
+        Compute the correction factor for thrust and update the online estimation of γ(B).
+        :param actuator_thrust (np.float64): The actuator thrust.
+        :param measured_thrust (np.float64): The measured thrust.
+        :param voltage (np.float64): The battery voltage.
+        :return: The current coefficients of γ(B), from the lowest degree.
+        """
+        correction_factor = self.compute_correction_factor_thrust(actuator_thrust, measured_thrust)
+        return self.correction_factor_estimator.update(voltage, correction_factor)
+
+    @staticmethod
+    def thrust_from_acceleration(mass: np.float64, aceleration: np.ndarray) -> np.ndarray:
+        """
+        Compute the thrust of many samples based on mass and acceleration, without storing
+        any state.
+
+        :param mass (np.float64): The mass input.
+        :param aceleration (np.ndarray): The accelerations in z axis.
+        :return: The computed thrusts.
+        """
+        aceleration = np.asarray(aceleration, dtype=np.float64)
+        if np.any(aceleration == 0):
+            raise ValueError("Acceleration cannot be zero to compute thrust.")
+        return mass * aceleration
+
+    @staticmethod
+    def correction_factor_from_thrust(actuator_thrust: np.ndarray,
+                                      measured_thrust: np.ndarray) -> np.ndarray:
+        """
+        Compute the correction factor for thrust of many samples, without storing any state.
+
+        :param actuator_thrust (np.ndarray): The actuator thrusts.
+        :param measured_thrust (np.ndarray): The measured thrusts.
+        :return: The correction factors.
+        """
+        return np.asarray(actuator_thrust, dtype=np.float64) / np.asarray(measured_thrust, dtype=np.float64)
+
     def compute_RMSE(self):
         """
         Compute the Root Mean Square Error (RMSE) of the mass error.
         :return: The RMSE.
         """
-        if len(self.mass_error_history) == 0:
-            return np.float64(0.0)
-        self.rmse = np.sqrt(np.mean(np.square(self.mass_error_history)))
+        self.rmse = self.mass_error_stats.rmse
         return self.rmse
+
+    def compute_window_RMSE(self):
+        """
+        Compute the RMSE of the last mass errors, in the window given at initialization.
+        :return: The RMSE.
+        """
+        return self.mass_error_stats.window_rmse
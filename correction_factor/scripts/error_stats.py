@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+# Copyright 2025 Universidad Politécnica de Madrid
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer in the
+#      documentation and/or other materials provided with the distribution.
+#
+#    * Neither the name of the Universidad Politécnica de Madrid nor the names of its
+#      contributors may be used to endorse or promote products derived from
+#      this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+""" Summary statistics of the error between two signals. """
+
+__authors__ = 'Carmen De Rojas Pita-Romero'
+__copyright__ = 'Copyright (c) 2025 Universidad Politécnica de Madrid'
+__license__ = 'BSD-3-Clause'
+
+from dataclasses import dataclass, field
+import numpy as np
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+@dataclass
+class ErrorStats:
+    """
+    Statistics of a per-sample error. NaN errors are left out of the statistics.
+    """
+    count: int  # Samples with a valid error
+    mean: float
+    std: float
+    rmse: float
+    percentiles: dict[int, float] = field(default_factory=dict)
+    unmatched_first: int = 0  # Samples of the first signal without a pair
+    unmatched_second: int = 0  # Samples of the second signal without a pair
+    invalid: int = 0  # Matched samples with a NaN error
+
+    @classmethod
+    def from_errors(cls, error: np.ndarray, unmatched_first: int = 0, unmatched_second: int = 0,
+                    percentiles: tuple[int, ...] = PERCENTILES) -> 'ErrorStats':
+        """
+        Compute the statistics of an error array
+
+        :param error: Error of each matched sample
+        :param unmatched_first: Samples of the first signal without a pair
+        :param unmatched_second: Samples of the second signal without a pair
+        :param percentiles: Percentiles of the error to compute
+        :return: Statistics of the error
+        """
+        error = np.asarray(error, dtype=np.float64)
+        valid = error[~np.isnan(error)]
+        if len(valid) == 0:
+            return cls(0, np.nan, np.nan, np.nan, {p: np.nan for p in percentiles},
+                       unmatched_first, unmatched_second, len(error))
+        return cls(
+            count=len(valid),
+            mean=float(np.mean(valid)),
+            std=float(np.std(valid)),
+            rmse=float(np.sqrt(np.mean(valid ** 2))),
+            percentiles=dict(zip(percentiles, np.percentile(valid, percentiles).tolist())),
+            unmatched_first=unmatched_first,
+            unmatched_second=unmatched_second,
+            invalid=len(error) - len(valid),
+        )
+
+    def __str__(self) -> str:
+        text = f"{self.mean} ± {self.std} (RMSE {self.rmse}, {self.count} samples"
+        if self.unmatched_first or self.unmatched_second:
+            text += f", {self.unmatched_first} + {self.unmatched_second} unmatched"
+        if self.invalid:
+            text += f", {self.invalid} NaN"
+        return text + ")"
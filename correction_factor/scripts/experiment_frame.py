@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+
+# Copyright 2025 Universidad Politécnica de Madrid
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer in the
+#      documentation and/or other materials provided with the distribution.
+#
+#    * Neither the name of the Universidad Politécnica de Madrid nor the names of its
+#      contributors may be used to endorse or promote products derived from
+#      this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+""" Columns of an experiment stored as NumPy arrays. """
+
+__authors__ = 'Carmen De Rojas Pita-Romero'
+__copyright__ = 'Copyright (c) 2025 Universidad Politécnica de Madrid'
+__license__ = 'BSD-3-Clause'
+
+from dataclasses import dataclass
+import numpy as np
+from time_series import PairView
+
+
+@dataclass
+class ExperimentFrame:
+    """
+    Named columns of an experiment, all of the same length. Pairs of columns are taken as
+    PairView, without copying them, to pass them to the functions that work with lists of
+    (key, value).
+    """
+    columns: dict[str, np.ndarray]
+
+    def __post_init__(self):
+        lengths = {name: len(values) for name, values in self.columns.items()}
+        if len(set(lengths.values())) > 1:
+            raise ValueError(f"The columns have different lengths: {lengths}")
+
+    @classmethod
+    def read(cls, csv_results, filename: str, columns: list[str] = None) -> 'ExperimentFrame':
+        """
+        Read the columns of a results file
+
+        :param csv_results: CSVResults used to read the file
+        :param filename: Results file
+        :param columns: Names of the columns to read. If None, all of them.
+        :return: Columns of the file
+        """
+        data = csv_results.read_csv(filename, columns)
+        if data is None:
+            raise ValueError(f"Could not read the experiment from '{filename}'")
+        return cls(dict(data))
+
+    @property
+    def names(self) -> list[str]:
+        return list(self.columns)
+
+    def __len__(self) -> int:
+        return len(next(iter(self.columns.values()), ()))
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.columns
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def __setitem__(self, name: str, values: np.ndarray):
+        values = np.asarray(values, dtype=np.float64)
+        if self.columns and len(values) != len(self):
+            raise ValueError(f"The column '{name}' has {len(values)} values, but the experiment has {len(self)}")
+        self.columns[name] = values
+
+    def pair(self, key: str, value: str) -> PairView:
+        """
+        Two columns seen as a list of (key, value)
+
+        :param key: Name of the column of the keys
+        :param value: Name of the column of the values
+        :return: View of the two columns
+        """
+        return PairView(self.columns[key], self.columns[value])
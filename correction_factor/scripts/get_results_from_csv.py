@@ -36,80 +36,90 @@ __license__ = 'BSD-3-Clause'
 
 
 from compute_results import ResultsComputer
+from experiment_frame import ExperimentFrame
 import plot_utils as pl
 import csv_utils as csv
 from pathlib import Path
 
+# Columns of the experiments used to get the results
+THRUST_SENDED = 'Thrust sended (N)'
+THRUST_MEASURED = 'Thrust measured (N)'
+VOLTAGE = 'Voltage (V)'
+ACC = 'Acc (m/s²)'
+THROTTLE = 'Throttle (%)'
+# Columns computed for each strategy
+THROTTLE_COMPUTED = 'Throttle computed (%)'
+CORRECTION_FACTOR = 'Correction factor'
+
 
 class GetResultsFromCSV:
-    def __init__(self, filename: str, tm_paramerters: list[float] = None, cf_parameters: list[float] = None, t_max: float = None, mass: float = 1.0):
-        self.csv_results = csv.CSVResults()
+    def __init__(self, filename: str, tm_paramerters: list[float] = None, cf_parameters: list[float] = None, t_max: float = None, mass: float = 1.0,
+                 csv_results: csv.CSVResults = None, plot: bool = True, plotter: pl.Plotter = None):
+        self.csv_results = csv_results or csv.CSVResults()
         self.compute = ResultsComputer()
-        self.plot = pl.Plotter()
-        data = self.csv_results.read_csv(f'{filename}.csv')
-        self.thrust_sended = data["Thrust sended (N)"]
-        self.thrust_measured = data["Thrust measured (N)"]
-        self.voltage = data["Voltage (V)"]
-        self.acc = data["Acc (m/s²)"]
+        # Without plots, e.g. in batch runs
+        self.plot = (plotter or pl.Plotter(self.csv_results)) if plot else None
+        self.data = ExperimentFrame.read(self.csv_results, f'{filename}.csv', [
+            THRUST_SENDED, THRUST_MEASURED, VOLTAGE, ACC, THROTTLE])
+        self.thrust_sended = self.data[THRUST_SENDED]
+        self.thrust_measured = self.data[THRUST_MEASURED]
+        self.voltage = self.data[VOLTAGE]
+        self.acc = self.data[ACC]
         self.m = ["m (Kg)"]
 
-        self.voltage_throttle = self.csv_results.get_vector_from_csv(
-            data["Voltage (V)"], data["Throttle (%)"])
-        self.thrust_throttle = self.csv_results.get_vector_from_csv(
-            data["Thrust measured (N)"], data["Throttle (%)"])
-        self.throttle_thrust_commanded = self.csv_results.get_vector_from_csv(
-            data["Throttle (%)"], data["Thrust sended (N)"])
-        self.throttle_thrust_meassured = self.csv_results.get_vector_from_csv(
-            data["Throttle (%)"], data["Thrust measured (N)"])
-        self.voltage_voltage = self.csv_results.get_vector_from_csv(
-            data["Voltage (V)"], data["Voltage (V)"])
+        # Views of pairs of columns, as lists of (x, y)
+        self.voltage_throttle = self.data.pair(VOLTAGE, THROTTLE)
+        self.thrust_throttle = self.data.pair(THRUST_MEASURED, THROTTLE)
+        self.throttle_thrust_commanded = self.data.pair(THROTTLE, THRUST_SENDED)
+        self.throttle_thrust_meassured = self.data.pair(THROTTLE, THRUST_MEASURED)
+        self.voltage_voltage = self.data.pair(VOLTAGE, VOLTAGE)
         self.tm_parameters = tm_paramerters
         self.cf_parameters = cf_parameters
         self.t_max = t_max
         self.mass = mass
 
+    def set_throttle(self, throttle):
+        self.data[THROTTLE_COMPUTED] = throttle
+        self.throttle = self.data.pair(THROTTLE, THROTTLE_COMPUTED)
+        self.voltage_vs_throttle = self.data.pair(VOLTAGE, THROTTLE_COMPUTED)
+
     def linear_aproximation(self):
-        self.throttle = self.compute.compute_throttle(
-            self.throttle_thrust_meassured, self.voltage_voltage, self.cf_parameters, True, None)
-        self.voltage_vs_throttle = self.compute.data1_vs_data2(
-            self.throttle, self.voltage_voltage)
+        self.set_throttle(self.compute.compute_throttle_array(
+            self.thrust_measured, self.voltage, self.cf_parameters, True, None))
 
     def thrustmap_without_correction_factor(self) -> list:
-        correction_factor = self.compute.run_correction_factor(
-            self.throttle_thrust_commanded, self.throttle_thrust_meassured, self.voltage_voltage, self.mass)
+        self.data[CORRECTION_FACTOR] = self.compute.correction_factor_array(
+            self.thrust_sended, self.thrust_measured)
+        correction_factor = self.data.pair(VOLTAGE, CORRECTION_FACTOR)
         self.cf_parameters = self.compute.get_parameters(correction_factor, 2)
         print(
             f'The ecuation for the correction factor is : {self.cf_parameters[2]} * x^2 + {self.cf_parameters[1]} * x + {self.cf_parameters[0]}')
-        self.throttle = self.compute.compute_throttle(
-            self.throttle_thrust_meassured, self.voltage_voltage, self.cf_parameters, False, self.tm_parameters)
-        self.voltage_vs_throttle = self.compute.data1_vs_data2(
-            self.throttle, self.voltage_voltage)
-        self.plot.plot_fitted_curve(
-            correction_factor, self.compute.func_2nd_order, self.cf_parameters)
+        self.set_throttle(self.compute.compute_throttle_array(
+            self.thrust_measured, self.voltage, self.cf_parameters, False, self.tm_parameters))
+        if self.plot is not None:
+            self.plot.plot_fitted_curve(
+                correction_factor, self.compute.func_2nd_order, self.cf_parameters)
 
     def thrustmap_with_correction_factor(self):
         print(
             f'The ecuation for the correction factor is : {self.cf_parameters[2]} * x^2 + {self.cf_parameters[1]} * x + {self.cf_parameters[0]}')
-        self.throttle = self.compute.compute_throttle(
-            self.throttle_thrust_meassured, self.voltage_voltage, self.cf_parameters, True, self.tm_parameters)
-        self.voltage_vs_throttle = self.compute.data1_vs_data2(
-            self.throttle, self.voltage_voltage)
+        self.set_throttle(self.compute.compute_throttle_array(
+            self.thrust_measured, self.voltage, self.cf_parameters, True, self.tm_parameters))
 
-    def compute_error(self, filename: str,):
+    def compute_error(self, filename: str, tolerance: float = None):
+        throttle = self.data[THROTTLE]
         print('Error between thrust commanded and measured')
-        self.error_thrust = self.compute.compute_error(
-            self.throttle_thrust_commanded, self.throttle_thrust_meassured)
+        _, E_Thrust, self.error_thrust_stats = self.compute.compute_error_array(
+            throttle, self.thrust_sended, throttle, self.thrust_measured, tolerance)
+        print(f"Error : {self.error_thrust_stats}")
         print('Error throttle vs voltage')
-        self.error_throttle_vs_voltage = self.compute.compute_error(
-            self.voltage_vs_throttle, self.voltage_throttle)
-        self.error_throttle_vs_thrust = self.compute.data1_vs_data2(
-            self.error_throttle_vs_voltage, self.throttle_thrust_meassured)
-
-        (V, _) = zip(*self.voltage_vs_throttle)
-        (_, T) = zip(*self.throttle_thrust_meassured)
-        (_, ET_V) = zip(*self.error_throttle_vs_voltage)
-        (_, ET_T) = zip(*self.error_throttle_vs_thrust)
-        (_, E_Thrust) = zip(*self.error_thrust)
+        V, ET_V, self.error_throttle_stats, rows = self.compute.compute_error_array(
+            self.voltage, self.data[THROTTLE_COMPUTED], self.voltage, throttle, tolerance, return_indices=True)
+        print(f"Error : {self.error_throttle_stats}")
+        # The throttle error against the thrust measured in the row of each matched sample
+        T = self.thrust_measured[rows]
+        ET_T = ET_V
+
         self.csv_results.save_data([V, ET_V, T, ET_T, E_Thrust], [
             'V (V)', 'ET_V (%)', 'T (N)', 'ET_T (%)', 'E_Thrust (%)'], f'{filename}_errors.csv', 'data/errors')
 
@@ -117,14 +127,10 @@ class GetResultsFromCSV:
         if cf_parameters is not None:
             self.cf_parameters = cf_parameters
         for file in filenames:
-            data = self.csv_results.read_csv(f'{file}')
-            throttle_thrust_commanded = self.csv_results.get_vector_from_csv(
-                data["Throttle (%)"], data["Thrust sended (N)"])
-            voltage_voltage = self.csv_results.get_vector_from_csv(
-                data["Voltage (V)"], data["Voltage (V)"])
-            throttle_thrust_meassured = self.csv_results.get_vector_from_csv(
-                data["Throttle (%)"], data["Thrust measured (N)"])
-            thrust_expected = self.compute.compute_thrust(
-                throttle_thrust_commanded, voltage_voltage, self.cf_parameters, False)
-            self.plot.plot([thrust_expected, throttle_thrust_meassured, throttle_thrust_commanded], [
+            data = ExperimentFrame.read(self.csv_results, f'{file}', [
+                THROTTLE, THRUST_SENDED, THRUST_MEASURED, VOLTAGE])
+            data['Thrust expected (N)'] = self.compute.compute_thrust_array(
+                data[THRUST_SENDED], data[VOLTAGE], self.cf_parameters, False)
+            self.plot.plot([data.pair(THROTTLE, 'Thrust expected (N)'), data.pair(THROTTLE, THRUST_MEASURED),
+                            data.pair(THROTTLE, THRUST_SENDED)], [
                 'Thrust expected', 'Thrust measured', 'Thrust commanded'], 'Compare Thrust from experiment of ' + Path(file).stem, 'Time (s)', 'Thrust (N)')
@@ -5,43 +5,60 @@ import csv_utils as csvr
 import bag_preparation as bp
 import compute_results as cr
 import get_results_from_csv as results
+from series_cache import SeriesCache
+from config_utils import csv_options, cf_parameters_list, tm_parameters_list
 import yaml
 import os
 from bag_reader import LogData
 import argparse
 
 
-def process(filename: str, log_file: str, folder_name: str, mass: float):
-    ros = bp.ProcessRosbag(log_file)
-    ros.run_preprocesing(mass)
-    ros.save_results(filename, folder_name)
+def process(filename: str, log_file: str, folder_name: str, mass: float, cache=None,
+            flying_only=False, freq_hz=1.0, csv_results=None):
+    flights = bp.ProcessRosbag.from_flights(log_file, cache=cache, flying_only=flying_only)
+    for ros in flights:
+        ros.run_preprocesing(mass, freq_hz)
+        if len(flights) == 1:
+            ros.save_results(filename, folder_name, csv_results)
+        else:
+            ros.save_results(f"{filename}_{ros.data.filename.name}", folder_name, csv_results)
 
 
-def get_results(filename: str, tm_paramerters, cf_parameters, t_max, mass, ref_value, read_only_csv):
-    csv = csvr.CSVResults()
-    plot = pl.Plotter()
+def get_results(filename: str, tm_paramerters, cf_parameters, t_max, mass, ref_value, read_only_csv,
+                csv_results=None, plots=None):
+    csv = csv_results or csvr.CSVResults()
+    plots = plots or {}
+    plot = pl.Plotter(csv, plots.get('output_dir', '/tmp'), plots.get('format', 'png'),
+                      plots.get('headless', False), plots.get('max_points'), plots.get('decimation', 'lttb'))
     print(f"[INFO] Reading results from {filename} using the mass {mass} kg")
     if not read_only_csv:
         csv.unify_csvs(f"data/{filename}", "data/results", f"{filename}.csv")
     compute_results = results.GetResultsFromCSV(
-        f"data/results/{filename}", tm_paramerters, cf_parameters, t_max, mass)
+        f"data/results/{filename}", tm_paramerters, cf_parameters, t_max, mass, csv, plotter=plot)
+    flights = csv.files_in_folder(f"data/{filename}")
     if t_max:
         compute_results.linear_aproximation()
-        plot.plot_thrust(csv.files_in_folder(f"data/{filename}"))
         print("Linear aproximation")
     elif cf_parameters:
         compute_results.thrustmap_with_correction_factor()
-        plot.plot_thrust(csv.files_in_folder(f"data/{filename}"))
         print("Thrust map for experiments with correction factor")
     else:
         compute_results.thrustmap_without_correction_factor()
         print("Thrust map for experiments without correction factor")
-        compute_results.computed_thrust_expected(csv.files_in_folder(f"data/{filename}"))
+        compute_results.computed_thrust_expected(flights)
     compute_results.compute_error(f'{filename}')
+    plot_thrust = bool(t_max or cf_parameters)
+    if plot.headless:
+        # The plots of each flight are independent, so they are rendered in parallel
+        pl.render_flights(flights, ref_value, plot_thrust, csv.options, plot.options, plots.get('max_workers'))
+        print(f"[INFO] Plots saved in {plot.output_dir}")
+        return
+    if plot_thrust:
+        plot.plot_thrust(flights)
     # Plot the real z position vs the reference value
-    plot.plot_position_z(csv.files_in_folder(f"data/{filename}"), ref_value)
+    plot.plot_position_z(flights, ref_value)
     # Plot the battery voltage vs time for each experiment
-    plot.plot_bat_vs_time(csv.files_in_folder(f"data/{filename}"))
+    plot.plot_bat_vs_time(flights)
     plot.show()
 
 
@@ -68,19 +85,24 @@ if __name__ == "__main__":
     mass = config.get("mass")
     read_only_csv = config.get("read_only_csv")
     ref_value = config.get("z_ref")
-    if not cf_params:
-        cf_params_list = None
+    flying_only = config.get("read_flying_only", False)
+    freq_hz = config.get("sample_frequency", 1.0)
+    csv_results = csvr.CSVResults(**csv_options(config))
+    cache_config = config.get("rosbag_cache")
+    if cache_config:
+        cache = SeriesCache(cache_config.get('folder', 'data/cache'),
+                            cache_config.get('max_size_mb', 2048))
     else:
-        cf_params_list = [cf_params['a2'], cf_params['a1'], cf_params['a0']]
-    tm_params = config.get("tm_parameters", {})
-    tm_params_list = [tm_params['a'], tm_params['b'], tm_params['c'],
-                      tm_params['d'], tm_params['e'], tm_params['f']]
+        cache = None
+    cf_params_list = cf_parameters_list(cf_params)
+    tm_params_list = tm_parameters_list(config.get("tm_parameters", {}))
     if not read_only_csv:
         for filename, path in rosbags.items():
             if not os.path.exists(path):
                 print(f"Rosbag file does not exist: {path}")
                 exit()
-            process(filename, path, folder_experiment, mass)
+            process(filename, path, folder_experiment, mass, cache, flying_only, freq_hz,
+                    csv_results)
             print(f"Processed {filename} from {path}")
     get_results(folder_experiment, tm_params_list, cf_params_list,
-                t_max, mass, ref_value, read_only_csv)
+                t_max, mass, ref_value, read_only_csv, csv_results, config.get("plots"))
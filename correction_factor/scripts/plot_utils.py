@@ -34,16 +34,54 @@ __authors__ = 'Carmen De Rojas Pita-Romero'
 __copyright__ = 'Copyright (c) 2025 Universidad Politécnica de Madrid'
 __license__ = 'BSD-3-Clause'
 
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 import numpy as np
 import pandas as pd
 import csv_utils as csv
+from decimation import decimate
+from time_series import as_arrays
 from pathlib import Path
 
 
 class Plotter:
-    def __init__(self):
-        self.csv_results = csv.CSVResults()
+    def __init__(self, csv_results: csv.CSVResults = None, output_dir: str = '/tmp', fmt: str = 'png',
+                 headless: bool = False, max_points: int = None, decimation: str = 'lttb'):
+        """
+        :param csv_results: Reader of the results files
+        :param output_dir: Folder where the figures are saved
+        :param fmt: Format of the figures, e.g. 'png', 'pdf' or 'svg'
+        :param headless: If True, the figures are built outside of pyplot and only saved, so
+            they are rendered without a display or changing the backend of the process, and
+            are not kept in memory once saved
+        :param max_points: Maximum number of points plotted for each series. If None, all of them.
+        :param decimation: How the series are downsampled to max_points: 'lttb' or 'minmax'
+        """
+        self.csv_results = csv_results or csv.CSVResults()
+        self.output_dir = Path(output_dir)
+        self.fmt = fmt
+        self.headless = headless
+        self.max_points = max_points
+        self.decimation = decimation
+
+    @property
+    def options(self) -> dict:
+        """Options to build an equivalent headless Plotter, e.g. in another process"""
+        return {'output_dir': str(self.output_dir), 'fmt': self.fmt, 'max_points': self.max_points,
+                'decimation': self.decimation}
+
+    def subplots(self):
+        """New figure and its axes, managed by pyplot unless in headless mode"""
+        if self.headless:
+            fig = Figure()
+            return fig, fig.subplots()
+        return plt.subplots()
+
+    def save(self, fig, title: str):
+        """Save a figure in the output folder"""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        fig.savefig(self.output_dir / f"{title.replace('/', '_')}.{self.fmt}")
 
     def synchronize_time(self, data):
         data = np.array(data, dtype=float)
@@ -52,9 +90,9 @@ class Plotter:
 
     def plot(self, data_list, label_list, title, xlabel, ylabel, xlim=None, ylim=None):
         """Plot data"""
-        fig, ax = plt.subplots()
+        fig, ax = self.subplots()
         for data, label in zip(data_list, label_list):
-            ts, xs = zip(*data)
+            ts, xs = decimate(*as_arrays(data), self.max_points, self.decimation)
             ax.plot(ts, xs, marker='.', linestyle='', label=label)
         ax.set_yscale('linear')
         ax.set_title(title)
@@ -65,13 +103,13 @@ class Plotter:
         # ax.invert_xaxis()
         ax.grid()
         ax.legend()
-        fig.savefig(f"/tmp/{title}.png")
+        self.save(fig, title)
         return fig
 
     def plot_line_only(self, m, b, x_min, x_max, title):
         x = np.linspace(x_min, x_max, 100)
         y = m * x + b
-        fig, ax = plt.subplots()
+        fig, ax = self.subplots()
 
         ax.plot(x, y, 'r-', label=f"$y = {m:.4f}x + {b:.2f}$")
         ax.set_xlabel("Time (s)")
@@ -79,7 +117,7 @@ class Plotter:
         ax.set_title(title)
         ax.grid(True)
         ax.legend()
-        fig.savefig(f"/tmp/{title}.png")
+        self.save(fig, title)
         return fig
 
     def plot_fitted_curve(self, data: pd.DataFrame, func, popt):
@@ -90,28 +128,34 @@ class Plotter:
         :param func: Function to fit the data.
         :param popt: Optimal parameters from the fit.
         """
-        battery, value = zip(*data)
-        plt.scatter(battery, value, label='Experimental data', s=10)
-        x_fit = np.linspace(min(battery), max(battery), 300)
+        battery, value = as_arrays(data)
+        fig, ax = self.subplots()
+        ax.scatter(*decimate(battery, value, self.max_points, self.decimation), label='Experimental data', s=10)
+        x_fit = np.linspace(np.nanmin(battery), np.nanmax(battery), 300)
         y_fit = func(x_fit, *popt)
         if len(popt) == 2:
-            plt.plot(x_fit, y_fit,
-                     label=f'$\gamma$ (B) = {popt[1]:.4f}B + {popt[0]:.4f}', color='orange')
-            plt.title('Correction Factor Fitted to a First-Degree Polynomial Curve')
+            ax.plot(x_fit, y_fit,
+                    label=f'$\gamma$ (B) = {popt[1]:.4f}B + {popt[0]:.4f}', color='orange')
+            title = 'Correction Factor Fitted to a First-Degree Polynomial Curve'
         elif len(popt) == 3:
-            plt.plot(
+            ax.plot(
                 x_fit, y_fit, label=f'$\gamma$ (B) = {popt[2]:.4f}B^2 + {popt[1]:.4f}B + {popt[0]:.4f}', color='orange')
-            plt.title('Correction Factor Fitted to a Second-Degree Polynomial Curve')
+            title = 'Correction Factor Fitted to a Second-Degree Polynomial Curve'
         elif len(popt) == 4:
-            plt.plot(
+            ax.plot(
                 x_fit, y_fit, label=f'$\gamma$ (B) = {popt[3]:.4f}B^3 + {popt[2]:.4f}B^2 + {popt[1]:.4f}B + {popt[0]:.4f}',
                 color='orange')
-            plt.title('Correction Factor Fitted to a Third-Degree Polynomial Curve')
-        plt.xlabel('Battery (V)')
-        plt.ylabel('$\gamma$ ')
-        plt.gca().invert_xaxis()
-        plt.legend()
-        plt.grid(True)
+            title = 'Correction Factor Fitted to a Third-Degree Polynomial Curve'
+        else:
+            title = 'Correction Factor Fitted to a Polynomial Curve'
+        ax.set_title(title)
+        ax.set_xlabel('Battery (V)')
+        ax.set_ylabel('$\gamma$ ')
+        ax.invert_xaxis()
+        ax.legend()
+        ax.grid(True)
+        self.save(fig, title)
+        return fig
 
     def plot_errors(self, file_paths: list):
 
@@ -121,7 +165,8 @@ class Plotter:
         errors_V_thrust = []
         legends = []
         for file_path in file_paths:
-            d = self.csv_results.read_csv(file_path)
+            d = self.csv_results.read_csv(
+                file_path, ['V (V)', 'ET_V (%)', 'T (N)', 'ET_T (%)', 'E_Thrust (%)'])
             data.append(d)
             errors_V.append(self.csv_results.get_vector_from_csv(d["V (V)"], d["ET_V (%)"]))
             errors_T.append(self.csv_results.get_vector_from_csv(d["T (N)"], d["ET_T (%)"]))
@@ -141,7 +186,7 @@ class Plotter:
         z_data = []
 
         for file_path in file_paths:
-            data = self.csv_results.read_csv(file_path)
+            data = self.csv_results.read_csv(file_path, ['Time (s)', 'Position_z (m)'])
             time = self.synchronize_time(data["Time (s)"])
             z = self.csv_results.get_vector_from_csv(time, data["Position_z (m)"])
             time_synced.append(time)
@@ -160,7 +205,7 @@ class Plotter:
         z_data = []
 
         for file_path in file_paths:
-            data = self.csv_results.read_csv(file_path)
+            data = self.csv_results.read_csv(file_path, ['Time (s)', 'Position_z (m)'])
             time = self.synchronize_time(data["Time (s)"])
             z = self.csv_results.get_vector_from_csv(time, data["Position_z (m)"])
             time_synced.append(time)
@@ -175,10 +220,10 @@ class Plotter:
 
     def plot_bat_vs_time_multiple_experiments(self, file_paths: list, labels: list = None):
         voltage_data = []
-        data_time = self.csv_results.read_csv(file_paths[0])
+        data_time = self.csv_results.read_csv(file_paths[0], ['Time (s)'])
         time = self.synchronize_time(data_time["Time (s)"])
         for file_path in file_paths:
-            data = self.csv_results.read_csv(file_path)
+            data = self.csv_results.read_csv(file_path, ['Voltage (V)'])
             voltage = self.csv_results.get_vector_from_csv(time, data["Voltage (V)"])
             voltage_data.append(voltage)
         labels = [f"Curve {i+1}" for i in range(len(voltage_data))]
@@ -188,15 +233,16 @@ class Plotter:
     def plot_bat_vs_time(self, file_paths: list, labels: list = None):
 
         for file_path in file_paths:
-            data = self.csv_results.read_csv(file_path)
+            data = self.csv_results.read_csv(file_path, ['Time (s)', 'Voltage (V)'])
             time = self.synchronize_time(data["Time (s)"])
             voltage = self.csv_results.get_vector_from_csv(time, data["Voltage (V)"])
             self.plot([voltage], ['Experiment from ' + Path(file_path).stem],
-                      'Battery vs Time', 'Time (s)', 'Battery (V)')
+                      'Battery vs Time in experiment ' + Path(file_path).stem, 'Time (s)', 'Battery (V)')
 
     def plot_thrust(self, file_paths: list, labels: list = None):
         for file_path in file_paths:
-            data = self.csv_results.read_csv(file_path)
+            data = self.csv_results.read_csv(
+                file_path, ['Time (s)', 'Thrust sended (N)', 'Thrust measured (N)'])
             thrust_comanded = self.csv_results.get_vector_from_csv(data["Time (s)"],
                                                                    data["Thrust sended (N)"])
             thrust_measured = self.csv_results.get_vector_from_csv(
@@ -209,7 +255,7 @@ class Plotter:
                       )
 
     def plot_throttle(self, file):
-        data = self.csv_results.read_csv(file)
+        data = self.csv_results.read_csv(file, ['Time (s)', 'Throttle (%)'])
 
         throttle = self.csv_results.get_vector_from_csv(
             data["Time (s)"], data["Throttle (%)"])
@@ -221,5 +267,45 @@ class Plotter:
                   )
 
     def show(self):
-        """Show all plots"""
-        plt.show()
+        """Show all plots. In headless mode they are only saved."""
+        if not self.headless:
+            plt.show()
+
+
+def render_flight(file_path: str, ref_value: float, thrust: bool, csv_options: dict,
+                  plot_options: dict = None) -> str:
+    """
+    Save the plots of a flight without a display: thrust, position in z and battery
+
+    :param file_path: Results file of the flight
+    :param ref_value: Reference of the position in z
+    :param thrust: If True, the thrust commanded and measured is plotted too
+    :param csv_options: Options of the CSVResults that read the results
+    :param plot_options: Options of the Plotter, as Plotter.options
+    :return: Results file of the flight
+    """
+    plot = Plotter(csv.CSVResults(**csv_options), headless=True, **(plot_options or {}))
+    if thrust:
+        plot.plot_thrust([file_path])
+    plot.plot_position_z([file_path], ref_value)
+    plot.plot_bat_vs_time([file_path])
+    return file_path
+
+
+def render_flights(file_paths: list, ref_value: float, thrust: bool, csv_options: dict,
+                   plot_options: dict = None, max_workers: int = None):
+    """
+    Save the plots of several flights in parallel, each of them in its own process
+
+    :param file_paths: Results files of the flights
+    :param max_workers: Number of processes. If None, the number of CPUs.
+    The rest of the parameters are the ones of render_flight.
+    """
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(render_flight, file_path, ref_value, thrust, csv_options, plot_options): file_path
+                   for file_path in file_paths}
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                print(f"[ERROR] Plots of '{futures[future]}' failed: {e}")
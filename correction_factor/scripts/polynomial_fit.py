@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+
+# Copyright 2025 Universidad Politécnica de Madrid
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer in the
+#      documentation and/or other materials provided with the distribution.
+#
+#    * Neither the name of the Universidad Politécnica de Madrid nor the names of its
+#      contributors may be used to endorse or promote products derived from
+#      this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+""" Linear least squares fitting of polynomials. """
+
+__authors__ = 'Carmen De Rojas Pita-Romero'
+__copyright__ = 'Copyright (c) 2025 Universidad Politécnica de Madrid'
+__license__ = 'BSD-3-Clause'
+
+from dataclasses import dataclass
+from math import comb
+import numpy as np
+
+
+@dataclass
+class PolynomialFit:
+    """
+    Result of a polynomial fit. The coefficients are ordered from the lowest degree, as
+    the parameters of ResultsComputer.func_*_order.
+    """
+    coefficients: np.ndarray
+    covariance: np.ndarray
+    residuals: np.ndarray
+    rss: float  # Residual sum of squares, weighted if there are weights
+    rmse: float
+    r_squared: float
+    dof: int  # Degrees of freedom of the residuals
+
+    @property
+    def degree(self) -> int:
+        return len(self.coefficients) - 1
+
+    @property
+    def std_errors(self) -> np.ndarray:
+        """Standard error of each coefficient"""
+        return np.sqrt(np.diag(self.covariance))
+
+
+def scaling_matrix(degree: int, offset: float, scale: float) -> np.ndarray:
+    """
+    Matrix that converts the coefficients of a polynomial in z = (x - offset) / scale into
+    the coefficients of the same polynomial in x.
+
+    :param degree: Degree of the polynomial
+    :param offset: Offset of x
+    :param scale: Scale of x
+    :return: Matrix T such that coefficients_x = T @ coefficients_z
+    """
+    n = degree + 1
+    T = np.zeros((n, n))
+    for k in range(n):
+        # ((x - offset) / scale)^k = sum_j comb(k, j) x^j (-offset)^(k - j) / scale^k
+        for j in range(k + 1):
+            T[j, k] = comb(k, j) * (-offset) ** (k - j) / scale ** k
+    return T
+
+
+def fit_polynomial(x: np.ndarray, y: np.ndarray, degree: int,
+                   weights: np.ndarray = None) -> PolynomialFit:
+    """
+    Fit a polynomial with linear least squares.
+
+    x is centered and scaled before building the Vandermonde matrix, which is solved with
+    a QR decomposition, so the fit stays well conditioned for voltages far from zero. The
+    covariance is scaled by the residual variance, as scipy.optimize.curve_fit does.
+
+    Samples with NaN or infinite values, e.g. empty cells of a CSV or a correction factor
+    with no measured thrust, are left out of the fit. The residuals are only computed for
+    the samples fitted.
+
+    :param x: Independent variable
+    :param y: Dependent variable
+    :param degree: Degree of the polynomial
+    :param weights: Weight of each sample in the sum of squared residuals. If None, all 1.
+    :return: Fitted polynomial
+    :raises ValueError: If there are fewer than degree + 1 finite samples
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    finite = np.isfinite(x) & np.isfinite(y)
+    if weights is not None:
+        weights = np.asarray(weights, dtype=np.float64)
+        finite &= np.isfinite(weights)
+        weights = weights[finite]
+    x, y = x[finite], y[finite]
+    n_params = degree + 1
+    if len(x) < n_params:
+        raise ValueError(f"At least {n_params} finite samples are needed to fit a degree {degree} polynomial, "
+                         f"there are {len(x)}")
+
+    offset = x.mean()
+    scale = x.std()
+    if scale == 0:
+        scale = 1.0
+    V = np.vander((x - offset) / scale, n_params, increasing=True)
+    sqrt_w = np.ones_like(y) if weights is None else np.sqrt(np.asarray(weights, dtype=np.float64))
+
+    Q, R = np.linalg.qr(V * sqrt_w[:, None])
+    coefficients_z = np.linalg.solve(R, Q.T @ (y * sqrt_w))
+
+    residuals = y - V @ coefficients_z
+    rss = float(np.sum((residuals * sqrt_w) ** 2))
+    dof = len(x) - n_params
+    residual_variance = rss / dof if dof > 0 else np.inf
+    R_inv = np.linalg.inv(R)
+    covariance_z = residual_variance * (R_inv @ R_inv.T)
+
+    T = scaling_matrix(degree, offset, scale)
+    y_mean = np.average(y, weights=None if weights is None else sqrt_w ** 2)
+    tss = float(np.sum(((y - y_mean) * sqrt_w) ** 2))
+    return PolynomialFit(
+        coefficients=T @ coefficients_z,
+        covariance=T @ covariance_z @ T.T,
+        residuals=residuals,
+        rss=rss,
+        rmse=float(np.sqrt(np.mean(residuals ** 2))),
+        r_squared=1 - rss / tss if tss > 0 else 1.0,
+        dof=dof,
+    )
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+
+# Copyright 2025 Universidad Politécnica de Madrid
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer in the
+#      documentation and/or other materials provided with the distribution.
+#
+#    * Neither the name of the Universidad Politécnica de Madrid nor the names of its
+#      contributors may be used to endorse or promote products derived from
+#      this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+""" Resampling of several time series to a common uniform grid. """
+
+__authors__ = 'Carmen De Rojas Pita-Romero'
+__copyright__ = 'Copyright (c) 2025 Universidad Politécnica de Madrid'
+__license__ = 'BSD-3-Clause'
+
+import numpy as np
+from time_series import TimeSeries
+
+
+def aggregate_bins(bins: np.ndarray, values: np.ndarray, n_bins: int, how: str = 'mean') -> np.ndarray:
+    """
+    Aggregate the values that fall in each bin
+
+    :param bins: Bin of each value
+    :param values: Values to aggregate, in time order
+    :param n_bins: Number of bins
+    :param how: 'mean', 'median', 'last', 'min', 'max' or 'count'
+    :return: Aggregated value of each bin. Empty bins are NaN, or 0 for 'count'.
+    """
+    if np.any(bins[1:] < bins[:-1]):
+        # The values of each bin must be contiguous. The sort is stable, so 'last' is still
+        # the last value of the bin.
+        order = np.argsort(bins, kind='stable')
+        bins = bins[order]
+        values = values[order]
+    counts = np.bincount(bins, minlength=n_bins)
+    if how == 'count':
+        return counts.astype(np.float64)
+
+    result = np.full(n_bins, np.nan)
+    if len(values) == 0:
+        return result
+    filled = counts > 0
+    # Index of the first value of each non-empty bin
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[filled]
+
+    if how == 'mean':
+        sums = np.bincount(bins, weights=values, minlength=n_bins)
+        result[filled] = sums[filled] / counts[filled]
+    elif how == 'median':
+        # Sort by bin, then by value inside each bin
+        sorted_values = values[np.lexsort((values, bins))]
+        lower = sorted_values[starts + (counts[filled] - 1) // 2]
+        upper = sorted_values[starts + counts[filled] // 2]
+        result[filled] = (lower + upper) / 2
+    elif how == 'last':
+        result[filled] = values[starts + counts[filled] - 1]
+    elif how == 'min':
+        result[filled] = np.minimum.reduceat(values, starts)
+    elif how == 'max':
+        result[filled] = np.maximum.reduceat(values, starts)
+    else:
+        raise ValueError(f"Unknown aggregation '{how}'")
+    return result
+
+
+def fill_gaps(stamps: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """
+    Linearly interpolate the NaN values. Before the first and after the last valid value,
+    they are held.
+
+    :param stamps: Sorted stamps
+    :param values: Values with gaps
+    :return: Values without gaps, or all NaN if there is no valid value
+    """
+    valid = ~np.isnan(values)
+    if valid.all() or not valid.any():
+        return values
+    return np.interp(stamps, stamps[valid], values[valid])
+
+
+def resample_uniform(series: list[TimeSeries], freq_hz: float,
+                     how: str = 'mean') -> tuple[np.ndarray, list[np.ndarray]]:
+    """
+    Resample several time series to the same uniform grid.
+
+    The grid has bins of 1 / freq_hz seconds aligned to multiples of the period, and covers
+    all the series. The samples of each series are aggregated in each bin, and the empty bins
+    are interpolated, so every series gets a value at every stamp of the grid.
+
+    :param series: Time series sorted by time. NaN values are ignored.
+    :param freq_hz: Desired frequency in Hz
+    :param how: Aggregation of the samples in each bin: 'mean', 'median' or 'last'
+    :return: (stamps in ns of the start of each bin, resampled values of each series)
+    """
+    period_ns = int(round(1e9 / freq_hz))
+    non_empty = [s for s in series if len(s) > 0]
+    if not non_empty:
+        return np.empty(0, dtype=np.int64), [np.empty(0) for _ in series]
+
+    first_bin = min(s.stamp_ns[0] // period_ns for s in non_empty)
+    last_bin = max(s.stamp_ns[-1] // period_ns for s in non_empty)
+    n_bins = int(last_bin - first_bin + 1)
+    stamps = (np.arange(n_bins, dtype=np.int64) + first_bin) * period_ns
+
+    columns = []
+    for s in series:
+        valid = ~np.isnan(s.value)
+        bins = s.stamp_ns[valid] // period_ns - first_bin
+        values = aggregate_bins(bins, s.value[valid], n_bins, how)
+        columns.append(fill_gaps(stamps, values))
+    return stamps, columns
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+
+# Copyright 2025 Universidad Politécnica de Madrid
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer in the
+#      documentation and/or other materials provided with the distribution.
+#
+#    * Neither the name of the Universidad Politécnica de Madrid nor the names of its
+#      contributors may be used to endorse or promote products derived from
+#      this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+""" On-disk cache of the time series read from rosbags. """
+
+__authors__ = 'Carmen De Rojas Pita-Romero'
+__copyright__ = 'Copyright (c) 2025 Universidad Politécnica de Madrid'
+__license__ = 'BSD-3-Clause'
+
+from pathlib import Path
+from time_series import TimeSeries
+import numpy as np
+import hashlib
+import os
+import tempfile
+import zipfile
+
+# Change it when the extracted data changes, so old entries are not used
+CACHE_VERSION = 1
+
+
+class SeriesCache:
+    """
+    Cache of the time series extracted from each rosbag, stored as .npz files.
+
+    The entries are keyed by the rosbag path, the size and modification time of its
+    files, the hash of its metadata.yaml, the topics read and how they were read, so any
+    change in the rosbag invalidates them. The least recently used entries are removed when the cache grows
+    over its maximum size.
+    """
+
+    def __init__(self, cache_dir: str = 'data/cache', max_size_mb: float = 2048):
+        self.cache_dir = Path(cache_dir)
+        self.max_size = int(max_size_mb * 1024 * 1024)
+
+    def fingerprint(self, rosbag: Path, topics: list[str], variant: str = '') -> str:
+        """
+        Get the key of a rosbag in the cache
+
+        :param rosbag: Rosbag folder
+        :param topics: Topics read from the rosbag
+        :param variant: Options used to read the rosbag, if any
+        :return: Hexadecimal key
+        """
+        rosbag = Path(rosbag).resolve()
+        key = hashlib.sha256()
+        key.update(f"{CACHE_VERSION}\n{rosbag}\n{variant}\n".encode())
+        for topic in topics:
+            key.update(f"{topic}\n".encode())
+        files = sorted(rosbag.iterdir()) if rosbag.is_dir() else [rosbag]
+        for file in files:
+            if file.is_file():
+                stat = file.stat()
+                key.update(f"{file.name}:{stat.st_size}:{stat.st_mtime_ns}\n".encode())
+        metadata = rosbag / 'metadata.yaml'
+        if metadata.is_file():
+            key.update(hashlib.sha256(metadata.read_bytes()).digest())
+        return key.hexdigest()
+
+    def entry_path(self, rosbag: Path, topics: list[str], variant: str = '') -> Path:
+        return self.cache_dir / f"{self.fingerprint(rosbag, topics, variant)}.npz"
+
+    def load(self, rosbag: Path, topics: list[str],
+             variant: str = '') -> dict[str, TimeSeries] | None:
+        """
+        Load the time series of a rosbag
+
+        :param rosbag: Rosbag folder
+        :param topics: Topics read from the rosbag
+        :param variant: Options used to read the rosbag, if any
+        :return: Attribute -> time series, or None if the rosbag is not in the cache
+        """
+        path = self.entry_path(rosbag, topics, variant)
+        try:
+            with np.load(path) as entry:
+                attributes = {name.rsplit('__', 1)[0] for name in entry.files}
+                series = {attribute: TimeSeries.from_unsorted(entry[f"{attribute}__stamp_ns"],
+                                                              entry[f"{attribute}__value"])
+                          for attribute in attributes}
+            # Mark the entry as recently used
+            os.utime(path)
+        except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+            return None
+        return series
+
+    def save(self, rosbag: Path, topics: list[str], series: dict[str, TimeSeries],
+             variant: str = ''):
+        """
+        Store the time series of a rosbag and evict the old entries if needed
+
+        :param rosbag: Rosbag folder
+        :param topics: Topics read from the rosbag
+        :param series: Attribute -> time series
+        :param variant: Options used to read the rosbag, if any
+        """
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self.entry_path(rosbag, topics, variant)
+        arrays = {}
+        for attribute, data in series.items():
+            arrays[f"{attribute}__stamp_ns"] = data.stamp_ns
+            arrays[f"{attribute}__value"] = data.value
+
+        # Write to a temporary file first, so other processes never read a partial entry
+        with tempfile.NamedTemporaryFile(dir=self.cache_dir, suffix='.tmp', delete=False) as file:
+            np.savez(file, **arrays)
+        os.replace(file.name, path)
+        self.evict()
+
+    def evict(self):
+        """
+        Remove the least recently used entries until the cache fits in its maximum size
+        """
+        entries = []
+        for path in self.cache_dir.glob('*.npz'):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            path.unlink(missing_ok=True)
+            total_size -= size
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+
+# Copyright 2025 Universidad Politécnica de Madrid
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer in the
+#      documentation and/or other materials provided with the distribution.
+#
+#    * Neither the name of the Universidad Politécnica de Madrid nor the names of its
+#      contributors may be used to endorse or promote products derived from
+#      this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+# POSSIBILITY OF SUCH DAMAGE.
+
+
+""" Time series stored as NumPy arrays. """
+
+__authors__ = 'Carmen De Rojas Pita-Romero'
+__copyright__ = 'Copyright (c) 2025 Universidad Politécnica de Madrid'
+__license__ = 'BSD-3-Clause'
+
+from dataclasses import dataclass
+import numpy as np
+
+
+def as_arrays(data) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Get the times and values of a time series as two arrays
+
+    :param data: List of (time, value), TimeSeries or PairView
+    :return: (times in seconds, values)
+    """
+    if isinstance(data, TimeSeries):
+        return data.time, data.value
+    if isinstance(data, PairView):
+        return data.key, data.value
+    if len(data) == 0:
+        return np.empty(0), np.empty(0)
+    pairs = np.asarray(data, dtype=np.float64).reshape(-1, 2)
+    return pairs[:, 0], pairs[:, 1]
+
+
+@dataclass
+class TimeSeries:
+    """
+    Time series of a single value, stored as two aligned arrays sorted by stamp.
+
+    It behaves as a list of (time, value) tuples, with the time in seconds, so it can be
+    passed to the functions that work with that representation. The stamps are not checked
+    when it is built: series from samples that may be out of order, e.g. the header stamps
+    of a rosbag, which stores the messages in the order they were received, are built with
+    from_unsorted.
+    """
+    stamp_ns: np.ndarray
+    value: np.ndarray
+
+    def __post_init__(self):
+        self.stamp_ns = np.asarray(self.stamp_ns, dtype=np.int64)
+        self.value = np.asarray(self.value, dtype=np.float64)
+        if self.stamp_ns.shape != self.value.shape:
+            raise ValueError(
+                f"Stamps and values have different shapes: {self.stamp_ns.shape} != {self.value.shape}")
+
+    @classmethod
+    def empty(cls) -> 'TimeSeries':
+        """Time series without samples"""
+        return cls(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64))
+
+    @classmethod
+    def from_unsorted(cls, stamp_ns: np.ndarray, value: np.ndarray) -> 'TimeSeries':
+        """
+        Build a time series from samples in any order, sorting them by stamp if needed
+
+        :param stamp_ns: Stamps in ns
+        :param value: Values
+        :return: Time series
+        """
+        stamp_ns = np.asarray(stamp_ns, dtype=np.int64)
+        value = np.asarray(value, dtype=np.float64)
+        if np.any(stamp_ns[1:] < stamp_ns[:-1]):
+            order = np.argsort(stamp_ns, kind='stable')
+            stamp_ns, value = stamp_ns[order], value[order]
+        return cls(stamp_ns, value)
+
+    @classmethod
+    def from_list(cls, data: list[tuple[float, float]]) -> 'TimeSeries':
+        """
+        Build a time series from a list of (time, value)
+
+        :param data: List of (time in seconds, value), in any order
+        :return: Time series
+        """
+        if len(data) == 0:
+            return cls.empty()
+        times, values = zip(*data)
+        stamp_ns = np.round(np.asarray(times, dtype=np.float64) * 1e9).astype(np.int64)
+        return cls.from_unsorted(stamp_ns, values)
+
+    @classmethod
+    def concatenate(cls, series: list['TimeSeries']) -> 'TimeSeries':
+        """
+        Merge several time series into one ordered by time
+
+        :param series: Time series to merge
+        :return: Merged time series
+        """
+        if not series:
+            return cls.empty()
+        stamp_ns = np.concatenate([s.stamp_ns for s in series])
+        value = np.concatenate([s.value for s in series])
+        order = np.argsort(stamp_ns, kind='stable')
+        return cls(stamp_ns[order], value[order])
+
+    @property
+    def time(self) -> np.ndarray:
+        """Time in seconds"""
+        return self.stamp_ns * 1e-9
+
+    def to_list(self) -> list[tuple[float, float]]:
+        """
+        Convert to a list of (time, value)
+        """
+        return list(self)
+
+    def __len__(self) -> int:
+        return len(self.stamp_ns)
+
+    def __iter__(self):
+        return zip(self.time.tolist(), self.value.tolist())
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return TimeSeries(self.stamp_ns[index], self.value[index])
+        return float(self.stamp_ns[index] * 1e-9), float(self.value[index])
+
+
+@dataclass
+class PairView:
+    """
+    Two aligned arrays, e.g. two columns of an experiment, seen as a list of (key, value)
+    tuples. The arrays are not copied.
+    """
+    key: np.ndarray
+    value: np.ndarray
+
+    def __post_init__(self):
+        self.key = np.asarray(self.key, dtype=np.float64)
+        self.value = np.asarray(self.value, dtype=np.float64)
+        if self.key.shape != self.value.shape:
+            raise ValueError(f"Keys and values have different shapes: {self.key.shape} != {self.value.shape}")
+
+    def to_list(self) -> list[tuple[float, float]]:
+        """
+        Convert to a list of (key, value)
+        """
+        return list(self)
+
+    def __len__(self) -> int:
+        return len(self.key)
+
+    def __iter__(self):
+        return zip(self.key.tolist(), self.value.tolist())
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return PairView(self.key[index], self.value[index])
+        return float(self.key[index]), float(self.value[index])
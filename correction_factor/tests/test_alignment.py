@@ -0,0 +1,20 @@
+import numpy as np
+from alignment import match_nearest, sample_period
+
+
+def test_default_tolerance_is_half_the_sample_period():
+    time2 = np.arange(10) * 0.01 + 1.7e9
+    # Epoch seconds at 100 Hz, the last sample is past the end of the second signal
+    time1 = time2[[1, 4, 9]] + [0.004, -0.0049, 0.006]
+    assert np.isclose(sample_period(time2), 0.01)
+    index1, index2 = match_nearest(time1, time2)
+    np.testing.assert_array_equal(index1, [0, 1])
+    np.testing.assert_array_equal(index2, [1, 4])
+
+
+def test_rows_without_pair_keep_the_others_aligned():
+    # Same column on both sides, as in GetResultsFromCSV.compute_error, with a NaN row
+    voltage = np.array([24.1, 24.0, np.nan, 23.9, 24.0])
+    index1, index2 = match_nearest(voltage, voltage)
+    np.testing.assert_array_equal(index1, [0, 1, 3, 4])
+    np.testing.assert_array_equal(index2, index1)
@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+
+# csv_utils imports the ROS messages of the timestamps
+pytest.importorskip('std_msgs')
+from csv_utils import CSVResults, ragged_rows  # noqa: E402
+
+
+@pytest.mark.parametrize('content, expected', [
+    (b'a,b,c\n1,2,3\n1,,\n\n4,5,6', []),
+    (b'a,b,c\n1,2,3\n1,2\n4,5,6,7\n', [3, 4]),
+    (b'a,b\r\n1,2\r\n1\r\n', [3]),
+    (b'\na,b\n1,2\n', []),
+    (b'a,b\n"1,5",2\n3\n', [3]),
+    (b'', []),
+])
+def test_ragged_rows(content, expected):
+    np.testing.assert_array_equal(ragged_rows(content), expected)
+
+
+def test_short_rows_are_not_filled_with_nan(tmp_path, capsys):
+    (tmp_path / 'short.csv').write_text('a,b,c\n1,2,3\n4,5\n')
+    assert CSVResults().read_csv(str(tmp_path / 'short.csv')) is None
+    assert 'line 3' in capsys.readouterr().out
+
+    (tmp_path / 'empty_cells.csv').write_text('a,b,c\n1,2,3\n4,,\n')
+    data = CSVResults().read_csv(str(tmp_path / 'empty_cells.csv'))
+    np.testing.assert_array_equal(data['b'], [2, np.nan])
@@ -0,0 +1,33 @@
+import numpy as np
+from disturbance_estimation import CorrectionFactorRLS, DisturbanceEstimation
+
+
+def battery_samples(n=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    voltage = rng.uniform(20.4, 25.2, n)
+    correction_factor = 5.9 - 0.43 * voltage + 0.0088 * voltage**2 + rng.normal(0, 1e-3, n)
+    return voltage, correction_factor
+
+
+def test_rls_matches_batch_least_squares_at_battery_voltages():
+    voltage, correction_factor = battery_samples()
+    estimator = CorrectionFactorRLS(degree=2)
+    estimator.update_batch(voltage, correction_factor)
+    expected = np.polyfit(voltage, correction_factor, 2)[::-1]
+    np.testing.assert_allclose(estimator.coefficients, expected, rtol=1e-6)
+    np.testing.assert_allclose(estimator.predict(voltage), np.polyval(expected[::-1], voltage), atol=1e-9)
+
+
+def test_disturbance_estimation_centers_the_online_estimation():
+    voltage, correction_factor = battery_samples(seed=1)
+    estimation = DisturbanceEstimation(1.254, voltage_offset=22.8, voltage_scale=2.4)
+    estimation.correction_factor_estimator.update_batch(voltage, correction_factor)
+    expected = np.polyfit(voltage, correction_factor, 2)[::-1]
+    np.testing.assert_allclose(estimation.correction_factor_estimator.coefficients, expected, rtol=1e-6)
+
+
+def test_thrust_error_against_the_imu_thrust():
+    estimation = DisturbanceEstimation(1.254)
+    assert estimation.compute_thrust_error(10.0, 9.5) == 0.5
+    assert estimation.thrust_error_history == []
+    assert estimation.thrust_error_stats.count == 1
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+from polynomial_fit import fit_polynomial
+
+
+def test_fit_matches_polyfit_at_battery_voltages():
+    rng = np.random.default_rng(0)
+    x = rng.uniform(20.0, 25.2, 200)
+    y = 5.9 - 0.43 * x + 0.0088 * x**2 + rng.normal(0, 1e-3, 200)
+    fit = fit_polynomial(x, y, 2)
+    np.testing.assert_allclose(fit.coefficients, np.polyfit(x, y, 2)[::-1], rtol=1e-8)
+
+
+def test_non_finite_samples_are_left_out():
+    rng = np.random.default_rng(1)
+    x = rng.uniform(20.0, 25.2, 100)
+    y = 1.0 + 0.5 * x - 0.01 * x**2
+    expected = fit_polynomial(x, y, 2)
+
+    x_bad = np.concatenate((x, [np.nan, 22.0, np.inf, 23.0]))
+    y_bad = np.concatenate((y, [1.0, np.nan, 2.0, np.inf]))
+    fit = fit_polynomial(x_bad, y_bad, 2)
+    assert np.all(np.isfinite(fit.coefficients))
+    np.testing.assert_allclose(fit.coefficients, expected.coefficients, rtol=1e-10)
+    assert len(fit.residuals) == len(x)
+
+
+def test_non_finite_weights_are_left_out():
+    x = np.array([20.0, 21.0, 22.0, 23.0, 24.0])
+    y = 2.0 * x + 1.0
+    weights = np.array([1.0, np.nan, 1.0, 1.0, 1.0])
+    fit = fit_polynomial(x, y, 1, weights)
+    np.testing.assert_allclose(fit.coefficients, [1.0, 2.0], atol=1e-10)
+
+
+def test_too_few_finite_samples_raise():
+    x = np.array([20.0, 21.0, np.nan, 23.0])
+    y = np.array([1.0, np.inf, 2.0, 3.0])
+    with pytest.raises(ValueError):
+        fit_polynomial(x, y, 2)
@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+from thrust_map_error import thrustmap
+from thrust_map_inverse import CHUNK_SIZE, inverse_thrustmap
+
+# Fitted 2nd and 4th degree thrust maps (thrust in N, voltage in V, ESC signal in µs)
+POPT_2ND = [368.38, 275.91, 64.33, -8.02, -7.16, -1.30]
+POPT_4TH = [1021.0, 95.2, 1.8, -12.4, -1.9, 0.02, 1.1, 0.21, 0.03, -0.001, -0.04, -0.008, -0.002, 0.0003, 0.00001]
+THRUST_RANGE = (0.5, 11.0)
+VOLTAGE_RANGE = (20.4, 25.2)
+
+
+# Thrust ranges where each map increases with thrust
+@pytest.mark.parametrize('popt, thrust_range', [(POPT_2ND, (0.5, 3.0)), (POPT_4TH, THRUST_RANGE)])
+def test_inverse_of_thrustmap(popt, thrust_range):
+    # More samples than a chunk of the Newton-bisection search
+    rng = np.random.default_rng(0)
+    thrust = rng.uniform(*thrust_range, 3 * CHUNK_SIZE + 7)
+    voltage = rng.uniform(*VOLTAGE_RANGE, thrust.size)
+    result = inverse_thrustmap(thrustmap(thrust, voltage, popt), voltage, popt, thrust_range)
+    np.testing.assert_allclose(result, thrust, atol=1e-8)
+
+
+def test_out_of_range():
+    limits = thrustmap(np.array(THRUST_RANGE), 22.0, POPT_4TH)
+    esc_signal = np.array([limits[0] - 10, thrustmap(5.0, 22.0, POPT_4TH), limits[1] + 10])
+    np.testing.assert_allclose(inverse_thrustmap(esc_signal, 22.0, POPT_4TH, THRUST_RANGE),
+                               [np.nan, 5.0, np.nan])
+    np.testing.assert_allclose(inverse_thrustmap(esc_signal, 22.0, POPT_4TH, THRUST_RANGE, out_of_range='clip'),
+                               [THRUST_RANGE[0], 5.0, THRUST_RANGE[1]])
+    with pytest.raises(ValueError):
+        inverse_thrustmap(esc_signal, 22.0, POPT_4TH, THRUST_RANGE, out_of_range='raise')
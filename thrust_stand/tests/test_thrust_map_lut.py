@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+from thrust_map_error import thrustmap
+from thrust_map_lut import build_lut
+
+# Fitted 2nd and 4th degree thrust maps (thrust in N, voltage in V, ESC signal in µs)
+POPT_2ND = [368.38, 275.91, 64.33, -8.02, -7.16, -1.30]
+POPT_4TH = [1021.0, 95.2, 1.8, -12.4, -1.9, 0.02, 1.1, 0.21, 0.03, -0.001, -0.04, -0.008, -0.002, 0.0003, 0.00001]
+THRUST_RANGE = (0.5, 11.0)
+VOLTAGE_RANGE = (20.4, 25.2)
+
+
+@pytest.mark.parametrize('popt', [POPT_2ND, POPT_4TH])
+@pytest.mark.parametrize('max_error', [0.1, 1.0])
+def test_error_below_max_error_off_grid(popt, max_error):
+    lut = build_lut(popt, THRUST_RANGE, VOLTAGE_RANGE, max_error)
+    rng = np.random.default_rng(0)
+    thrust = rng.uniform(*THRUST_RANGE, 200_000)
+    voltage = rng.uniform(*VOLTAGE_RANGE, 200_000)
+    error = np.abs(lut(thrust, voltage) - thrustmap(thrust, voltage, popt))
+    assert error.max() <= max_error
+
+
+def test_finer_error_needs_a_finer_grid():
+    coarse = build_lut(POPT_2ND, THRUST_RANGE, VOLTAGE_RANGE, 1.0)
+    fine = build_lut(POPT_2ND, THRUST_RANGE, VOLTAGE_RANGE, 0.1)
+    assert fine.table.size > coarse.table.size
+
+
+@pytest.mark.parametrize('thrust_range, voltage_range', [((5.0, 5.0), VOLTAGE_RANGE), (THRUST_RANGE, (22.0, 22.0))])
+def test_empty_ranges_are_rejected(thrust_range, voltage_range):
+    with pytest.raises(ValueError):
+        build_lut(POPT_2ND, thrust_range, voltage_range)
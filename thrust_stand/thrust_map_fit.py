@@ -3,6 +3,7 @@ import matplotlib.pyplot as plt
 from thrust_map_utils import *
 from thrust_map_plot import setup_figure_3D, scatter_plot, surface_plot
 from thrust_map_error import compute_error
+from thrust_map_lut import build_lut
 from scipy.optimize import curve_fit
 
 
@@ -61,9 +62,18 @@ if __name__ == '__main__':
     if config['compute_error']:
         compute_error(data, popt)
 
+    if config.get('lut_file'):
+        lut = build_lut(popt,
+                        (data['Thrust (N)'].min(), data['Thrust (N)'].max()),
+                        (data['Voltage (V)'].min(), data['Voltage (V)'].max()),
+                        config.get('lut_max_error', 1.0), func)
+        lut.save(f"results/{config['lut_file']}")
+        print(f'Lookup table of {lut.table.shape} points, max error {lut.max_error} µs')
+
     if config['plot_results']:
         fig, ax = setup_figure_3D()
         surface_plot(data, fig, ax, func, popt, config['plotting']['color'])
-        scatter_plot(data, fig, ax, config['plotting']['color'])
+        scatter_plot(data, fig, ax, config['plotting']['color'],
+                     config['plotting'].get('max_points'))
 
         plt.show()
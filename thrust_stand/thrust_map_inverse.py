@@ -0,0 +1,162 @@
+import numpy as np
+
+# Exponents (thrust, voltage) of each coefficient of the thrust map, in the order used by
+# thrustmap and func_*_order
+TERM_EXPONENTS = [(0, 0), (1, 0), (0, 1), (2, 0), (1, 1), (0, 2), (3, 0), (2, 1), (1, 2), (0, 3),
+                  (4, 0), (3, 1), (2, 2), (1, 3), (0, 4)]
+
+# Number of samples searched at once by inverse_thrustmap
+CHUNK_SIZE = 2**16
+
+
+def thrust_coefficients(voltage, popt):
+    # Coefficients c_k(voltage) of the thrust map as a polynomial in thrust, sum c_k * thrust^k,
+    # from the lowest degree
+    degree = max((i for coeff, (i, _) in zip(popt, TERM_EXPONENTS) if coeff != 0), default=0)
+    c = np.zeros((degree + 1,) + np.shape(voltage))
+    powers = [np.ones(np.shape(voltage))]
+    for coeff, (i, j) in zip(popt, TERM_EXPONENTS):
+        if coeff != 0:
+            while len(powers) <= j:
+                powers.append(powers[-1] * voltage)
+            c[i] += coeff * powers[j]
+    return c
+
+
+def evaluate(c, thrust):
+    # Polynomial in thrust and its derivative, with Horner's method
+    value = np.zeros_like(thrust)
+    derivative = np.zeros_like(thrust)
+    for coeff in c[::-1]:
+        derivative = derivative * thrust + value
+        value = value * thrust + coeff
+    return value, derivative
+
+
+def initial_guess(value_low, value_high, voltage, popt, thrust_range, nodes=64):
+    # Starting thrust for the Newton-bisection search. The ESC signal is taken as its position
+    # between the map at both limits of thrust_range, from value_low and value_high, and the
+    # thrust is interpolated bilinearly in the map inverted on a nodes x nodes grid of voltage
+    # and that position.
+    low, high = thrust_range
+    finite = np.isfinite(voltage)
+    if not finite.any():
+        return np.full(voltage.shape, np.nan)
+    v_min, v_max = voltage[finite].min(), voltage[finite].max()
+    if v_max == v_min:
+        v_max = v_min + 1.0
+    voltage_grid = np.linspace(v_min, v_max, nodes)
+    position_grid = np.linspace(0, 1, nodes)
+    thrust_grid = np.linspace(low, high, 4 * nodes)
+    forward, _ = evaluate(thrust_coefficients(voltage_grid[:, None], popt), thrust_grid)
+    forward = (forward - forward[:, :1]) / (forward[:, -1:] - forward[:, :1])
+    # The map increases with thrust, this only keeps np.interp valid where it does not
+    forward = np.maximum.accumulate(forward, axis=1)
+    table = np.array([np.interp(position_grid, row, thrust_grid) for row in forward])
+
+    def cell(position):
+        # Index of the grid cell of a position from 0 to 1 and where it is inside the cell
+        position = np.clip(np.nan_to_num(position) * (nodes - 1), 0, nodes - 1)
+        index = np.minimum(position.astype(np.intp), nodes - 2)
+        return index, position - index
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        i, u = cell((voltage - v_min) / (v_max - v_min))
+        j, w = cell(value_low / (value_low - value_high))
+    flat = table.ravel()
+    k = i * nodes + j
+    return ((1 - u) * ((1 - w) * flat[k] + w * flat[k + 1]) +
+            u * ((1 - w) * flat[k + nodes] + w * flat[k + nodes + 1]))
+
+
+def newton_bisection(c, low, high, value_low, value_high, x=None, tol=1e-9, max_iter=60):
+    # Root of the polynomial in thrust inside [low, high], where it goes from value_low <= 0 to
+    # value_high >= 0. Newton steps are taken when they stay inside the bracket, bisection
+    # otherwise. Only the samples that have not converged yet are iterated.
+    # x: starting point, the secant between the limits of the bracket if not given
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if x is None:
+            x = np.where(value_high > value_low, low - value_low * (high - low) / (value_high - value_low),
+                         (low + high) / 2)
+        else:
+            x = np.where(np.isfinite(value_low) & np.isfinite(value_high), np.clip(x, low, high), np.nan)
+    active = np.flatnonzero(np.isfinite(x))
+    c, low, high, x_active = c[:, active], low[active], high[active], x[active]
+    for _ in range(max_iter):
+        value, derivative = evaluate(c, x_active)
+        below = value < 0
+        np.copyto(low, x_active, where=below)
+        np.copyto(high, x_active, where=~below)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            step = x_active - value / derivative
+        outside = ~((step >= low) & (step <= high))
+        if outside.any():
+            step[outside] = (low[outside] + high[outside]) / 2
+        converged = (np.abs(step - x_active) <= tol) | (high - low <= tol)
+        # The samples are only written back once they have converged or at the last iteration
+        if converged.all():
+            x[active] = step
+            break
+        x[active[converged]] = step[converged]
+        keep = ~converged
+        active, c, low, high, x_active = active[keep], c[:, keep], low[keep], high[keep], step[keep]
+    else:
+        x[active] = x_active
+    return x
+
+
+def inverse_thrustmap(esc_signal, voltage, popt, thrust_range, out_of_range='nan'):
+    # Thrust for each (ESC signal, voltage) pair, inverting the thrust map given by popt
+    # (same layout as thrustmap). The thrust map must increase with thrust inside thrust_range.
+    # 1st and 2nd order maps are solved in closed form, higher orders with a vectorized
+    # Newton-bisection search in thrust_range, started from a tabulated guess and only run for the
+    # ESC signals that the map reaches in thrust_range.
+    # out_of_range: what to return for ESC signals that the map does not reach in thrust_range:
+    # 'nan', 'clip' (the limit of the range) or 'raise' (ValueError)
+    esc_signal, voltage = np.broadcast_arrays(np.asarray(esc_signal, dtype=np.float64),
+                                              np.asarray(voltage, dtype=np.float64))
+    low, high = thrust_range
+    c = thrust_coefficients(voltage, popt)
+    c[0] = c[0] - esc_signal
+
+    value_low, _ = evaluate(c, float(low))
+    value_high, _ = evaluate(c, float(high))
+    below = value_low > 0
+    above = value_high < 0
+    valid = ~(below | above)
+    if out_of_range == 'raise' and not valid.all():
+        raise ValueError(f'{np.count_nonzero(~valid)} ESC signals are out of the thrust range {thrust_range}')
+
+    degree = len(c) - 1
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if degree == 0:
+            thrust = np.full(esc_signal.shape, np.nan)
+        elif degree == 1:
+            thrust = -c[0] / c[1]
+        elif degree == 2:
+            # Root where the map increases, c1 + 2 c2 x = +sqrt(discriminant), in the form
+            # that does not cancel when c2 is small
+            sqrt_discriminant = np.sqrt(c[1]**2 - 4 * c[2] * c[0])
+            thrust = np.where(c[1] >= 0,
+                              -2 * c[0] / (c[1] + sqrt_discriminant),
+                              (sqrt_discriminant - c[1]) / (2 * c[2]))
+        else:
+            # The search runs on chunks of the samples that fit in the CPU cache, which is faster
+            # than going over whole arrays at each iteration
+            thrust = np.full(esc_signal.size, np.nan)
+            index = np.flatnonzero(valid)
+            c = c.reshape(len(c), -1)
+            value_low, value_high, voltage = value_low.ravel(), value_high.ravel(), voltage.ravel()
+            for start in range(0, index.size, CHUNK_SIZE):
+                chunk = index[start:start + CHUNK_SIZE]
+                guess = initial_guess(value_low[chunk], value_high[chunk], voltage[chunk], popt, thrust_range)
+                thrust[chunk] = newton_bisection(c[:, chunk], np.full(chunk.size, float(low)),
+                                                 np.full(chunk.size, float(high)), value_low[chunk],
+                                                 value_high[chunk], guess)
+            thrust = thrust.reshape(esc_signal.shape)
+
+    if out_of_range == 'clip':
+        thrust = np.where(below, low, np.where(above, high, thrust))
+    else:
+        thrust = np.where(valid, thrust, np.nan)
+    return thrust
@@ -0,0 +1,111 @@
+import numpy as np
+from thrust_map_error import thrustmap
+
+
+class ThrustMapLUT:
+    # Thrust map sampled on a regular (thrust, voltage) grid and evaluated with bilinear
+    # interpolation. Inputs outside the grid are clamped to its limits.
+
+    def __init__(self, thrust_axis, voltage_axis, table, max_error=np.nan):
+        self.thrust_axis = np.asarray(thrust_axis, dtype=np.float64)
+        self.voltage_axis = np.asarray(voltage_axis, dtype=np.float64)
+        self.table = np.asarray(table, dtype=np.float64)  # shape (len(thrust), len(voltage))
+        self.max_error = float(max_error)  # max interpolation error found when building it
+        self.thrust_step = self.thrust_axis[1] - self.thrust_axis[0]
+        self.voltage_step = self.voltage_axis[1] - self.voltage_axis[0]
+
+    def __call__(self, thrust, voltage):
+        # Vectorized bilinear lookup of the ESC signal (µs)
+        ix, tx = self._locate(thrust, self.thrust_axis, self.thrust_step)
+        iy, ty = self._locate(voltage, self.voltage_axis, self.voltage_step)
+        ny = self.table.shape[1]
+        flat = self.table.ravel()
+        i = ix * ny + iy
+        t00, t01, t10, t11 = flat[i], flat[i + 1], flat[i + ny], flat[i + ny + 1]
+        low = t00 + tx * (t10 - t00)
+        high = t01 + tx * (t11 - t01)
+        return low + ty * (high - low)
+
+    @staticmethod
+    def _locate(values, axis, step):
+        # Cell index and relative position inside the cell of each value
+        position = (np.clip(values, axis[0], axis[-1]) - axis[0]) * (1 / step)
+        index = np.minimum(np.asarray(position).astype(np.intp), len(axis) - 2)
+        return index, position - index
+
+    def save(self, filename):
+        np.savez(filename, thrust_axis=self.thrust_axis, voltage_axis=self.voltage_axis,
+                 table=self.table, max_error=self.max_error)
+
+    @classmethod
+    def load(cls, filename):
+        with np.load(filename) as data:
+            return cls(data['thrust_axis'], data['voltage_axis'], data['table'], data['max_error'])
+
+
+def max_second_derivatives(evaluate, thrust_range, voltage_range, n_probe=201):
+    # Largest |d²f/dx²| and |d²f/dy²| over the range, with finite differences on a dense grid
+    x = np.linspace(*thrust_range, n_probe)
+    y = np.linspace(*voltage_range, n_probe)
+    z = evaluate(*np.meshgrid(x, y, indexing='ij'))
+    hx, hy = x[1] - x[0], y[1] - y[0]
+    fxx = np.abs(z[2:, :] - 2 * z[1:-1, :] + z[:-2, :]).max() / hx**2
+    fyy = np.abs(z[:, 2:] - 2 * z[:, 1:-1] + z[:, :-2]).max() / hy**2
+    return fxx, fyy
+
+
+def interpolation_error(lut, evaluate):
+    # Max error of the table at the cell centers and edge midpoints, where bilinear
+    # interpolation of a smooth surface is the furthest from it
+    x = lut.thrust_axis
+    y = lut.voltage_axis
+    x_mid = np.concatenate((x, (x[:-1] + x[1:]) / 2))
+    y_mid = np.concatenate((y, (y[:-1] + y[1:]) / 2))
+    xx, yy = np.meshgrid(x_mid, y_mid, indexing='ij')
+    return np.abs(lut(xx, yy) - evaluate(xx, yy)).max()
+
+
+def build_lut(popt, thrust_range, voltage_range, max_error_us=1.0, func=None, max_points=4096):
+    # Sample the thrust map with the coarsest grid whose bilinear interpolation error is below
+    # max_error_us. func follows the thrust_map_utils signature func((thrust, voltage), *popt);
+    # if None, popt is evaluated with thrustmap.
+    for name, (low, high) in (('thrust', thrust_range), ('voltage', voltage_range)):
+        if not high > low:
+            raise ValueError(f'The {name} range of the lookup table is empty: [{low}, {high}]')
+    if func is None:
+        def evaluate(x, y): return thrustmap(x, y, popt)
+    else:
+        def evaluate(x, y): return func((x, y), *popt)
+
+    # Bilinear interpolation error is bounded by (hx² max|fxx| + hy² max|fyy|) / 8, with hx and
+    # hy the widths of the cells. Start giving half of the error budget to each axis.
+    fxx, fyy = max_second_derivatives(evaluate, thrust_range, voltage_range)
+    widths = (thrust_range[1] - thrust_range[0], voltage_range[1] - voltage_range[0])
+    sizes = []
+    for width, second_derivative in zip(widths, (fxx, fyy)):
+        if second_derivative > 0:
+            step = np.sqrt(4 * max_error_us / second_derivative)
+            sizes.append(min(int(np.ceil(width / step)) + 1, max_points))
+        else:
+            sizes.append(2)
+
+    def error_bounds(sizes):
+        return [(width / (n - 1))**2 * second_derivative / 8
+                for width, n, second_derivative in zip(widths, sizes, (fxx, fyy))]
+
+    # Refine the axis that contributes more to the bound while it is above max_error_us
+    while sum(error_bounds(sizes)) > max_error_us:
+        bounds = error_bounds(sizes)
+        axis = 0 if bounds[0] >= bounds[1] else 1
+        if sizes[axis] == max_points:
+            axis = 1 - axis
+        if sizes[axis] == max_points or bounds[axis] == 0:
+            print(f'Max error bound {sum(bounds)} µs above {max_error_us} µs with the maximum table size')
+            break
+        sizes[axis] = min(2 * sizes[axis] - 1, max_points)
+
+    x = np.linspace(*thrust_range, sizes[0])
+    y = np.linspace(*voltage_range, sizes[1])
+    lut = ThrustMapLUT(x, y, evaluate(*np.meshgrid(x, y, indexing='ij')))
+    lut.max_error = interpolation_error(lut, evaluate)
+    return lut
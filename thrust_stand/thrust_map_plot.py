@@ -11,10 +11,40 @@ def setup_figure_3D() -> Tuple[plt.Figure, Axes3D]:
     return fig, ax
 
 
-def scatter_plot(data: pd.DataFrame, fig: plt.Figure, ax: Axes3D, color: str):
+def voxel_thin(points: np.ndarray, max_points: int) -> np.ndarray:
+    # Sorted indices of the points kept: one point (row) of each cell of a regular grid over
+    # the bounding box, with the finest grid that keeps at most max_points, so dense regions
+    # are thinned while sparse points and outliers are kept
+    low = points.min(axis=0)
+    span = points.max(axis=0) - low
+    span[span == 0] = 1.0
+    unit = (points - low) / span
+
+    def cells(resolution):
+        index = np.minimum((unit * resolution).astype(np.int64), resolution - 1)
+        keys = (index[:, 0] * resolution + index[:, 1]) * resolution + index[:, 2]
+        return np.unique(keys, return_index=True)[1]
+
+    # Largest grid resolution that keeps at most max_points
+    low_res, high_res = 1, max(2, int(np.ceil(len(points) ** (1 / 3))) * 4)
+    kept = cells(low_res)
+    while high_res - low_res > 1:
+        resolution = (low_res + high_res) // 2
+        index = cells(resolution)
+        if len(index) <= max_points:
+            low_res, kept = resolution, index
+        else:
+            high_res = resolution
+    return np.sort(kept)
+
+
+def scatter_plot(data: pd.DataFrame, fig: plt.Figure, ax: Axes3D, color: str, max_points: int = None):
     # ax = fig.add_subplot(111, projection='3d')
-    ax.scatter(data['Thrust (N)'], data['Voltage (V)'],
-               data['ESC signal (µs)'], label='Data from multirotor experiments', color=color)
+    points = data[['Thrust (N)', 'Voltage (V)', 'ESC signal (µs)']].to_numpy(dtype=np.float64)
+    if max_points and len(points) > max_points:
+        points = points[voxel_thin(points, max_points)]
+    ax.scatter(points[:, 0], points[:, 1], points[:, 2],
+               label='Data from multirotor experiments', color=color)
 
     ax.set_xlabel('Thrust (N)', fontsize=18, labelpad=16)
     ax.set_ylabel('Voltage (V)', fontsize=18, labelpad=16)
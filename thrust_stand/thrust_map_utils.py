@@ -158,6 +158,7 @@ if __name__ == '__main__':
     data = filter_data(data, config['data_filter'])
 
     fig, ax = setup_figure_3D()
-    scatter_plot(data, fig, ax, config['plotting']['color'])
+    scatter_plot(data, fig, ax, config['plotting']['color'],
+                 config['plotting'].get('max_points'))
 
     plt.show()